@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# fields of the cached users, the password hash stays in the database
+CACHED_FIELDS = ("id", "username", "last_login")
+
+
+def user_key(user_id):
+    return f"authentication:user:{user_id}"
+
+
+def invalidate_user(user_id):
+    cache.delete(user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend reading the user of the session through the cache. Only
+    the fields of CACHED_FIELDS and the session hash, which the session
+    holds already, are cached, the password is loaded if it is read. The
+    cached user is removed when the user is saved or deleted, in the cache
+    of the other processes too when it is shared, and expires after
+    USER_CACHE_TIMEOUT otherwise.
+    """
+
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        cached = cache.get(key)
+        if cached is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, {
+                "fields": [getattr(user, field) for field in CACHED_FIELDS],
+                "session_auth_hash": user.get_session_auth_hash(),
+            }, settings.USER_CACHE_TIMEOUT)
+        else:
+            user = get_user_model().from_db(DEFAULT_DB_ALIAS, CACHED_FIELDS,
+                                            cached["fields"])
+            user.cached_session_auth_hash = cached["session_auth_hash"]
+        return user if self.user_can_authenticate(user) else None
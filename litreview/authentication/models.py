@@ -7,3 +7,15 @@ class User(AbstractBaseUser):
     objects = UserManager()
 
     USERNAME_FIELD = 'username'
+
+    # set on the users read from the cache, whose password is not loaded
+    cached_session_auth_hash = None
+
+    def get_session_auth_hash(self):
+        if self.cached_session_auth_hash is not None:
+            return self.cached_session_auth_hash
+        return super().get_session_auth_hash()
+
+    def set_password(self, raw_password):
+        self.cached_session_auth_hash = None
+        super().set_password(raw_password)
@@ -1,3 +1,111 @@
-# from django.test import TestCase
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .backends import CachedModelBackend, user_key
+from .models import User
+
+
+class LoginPageTests(TestCase):
+    password = "Hello1234!"
+
+    def setUp(self):
+        self.user = User(username="toto")
+        self.user.set_password(self.password)
+        self.user.save()
+
+    def test_authenticated_user_is_redirected_without_user_scan(self):
+        self.client.force_login(self.user)
+
+        # user of the request only, the session is cached
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("login"))
+
+        self.assertRedirects(response, reverse("feed"),
+                             fetch_redirect_response=False)
+
+    def test_anonymous_user_gets_login_page(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("login"))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_wrong_password_is_reported(self):
+        response = self.client.post(reverse("login"),
+                                    {"username": "toto",
+                                     "password": "mauvais"})
+
+        self.assertContains(response, "Le mot de passe est erroné.")
+
+    def test_unknown_user_is_reported(self):
+        response = self.client.post(reverse("login"),
+                                    {"username": "inconnu",
+                                     "password": self.password})
+
+        self.assertContains(response, "L&#x27;utilisateur n&#x27;existe pas.")
+
+
+class CachedUserTests(TestCase):
+    password = "Hello1234!"
+
+    def setUp(self):
+        cache.clear()
+        self.user = User(username="toto")
+        self.user.set_password(self.password)
+        self.user.save()
+
+    def test_session_and_user_are_read_from_cache(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("login"))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("login"))
+
+        self.assertRedirects(response, reverse("feed"),
+                             fetch_redirect_response=False)
+
+    def test_session_is_loaded_from_database_once_cache_is_cleared(self):
+        self.client.force_login(self.user)
+        cache.clear()
+
+        # session, user
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("login"))
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_password_change_ends_cached_sessions(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("login"))
+
+        self.user.set_password("Nouveau1234!")
+        self.user.save()
+        response = self.client.get(reverse("login"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(SESSION_KEY, self.client.session)
+
+    def test_deleted_user_is_logged_out(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("login"))
+
+        self.user.delete()
+        response = self.client.get(reverse("login"))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_hash_is_not_cached(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("login"))
+
+        cached = cache.get(user_key(self.user.id))
+        self.assertNotIn(self.user.password, repr(cached))
+
+    def test_cached_user_loads_its_password_when_read(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("login"))
+        user = CachedModelBackend().get_user(self.user.id)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password(self.password))
@@ -9,11 +9,11 @@ from . import forms, models
 class LoginPageView(View):
     form = forms.LoginForm
     template_name = "authentication/login.html"
-    users = models.User.objects.all()
+    model = models.User
 
     def get(self, request):
         form = self.form()
-        if request.user in self.users:
+        if request.user.is_authenticated:
             return redirect("feed")
         return render(request,
                       self.template_name,
@@ -32,7 +32,8 @@ class LoginPageView(View):
                 login(request, user)
                 messages.add_message(request, messages.SUCCESS, message)
                 return redirect("feed")
-            elif self.users.filter(username=form.cleaned_data["username"]):
+            elif self.model.objects.filter(
+                    username=form.cleaned_data["username"]).exists():
                 message = "Le mot de passe est erroné."
             elif user is None:
                 message = "L'utilisateur n'existe pas. " \
@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'litreview.settings')
+# the queries of an ASGI request run in a thread of their own, a connection
+# kept open by that thread would never be reused
+os.environ.setdefault('LITREVIEW_CONN_MAX_AGE', '0')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported once the applications are loaded
+from review.events import FeedEventsMiddleware  # noqa: E402
+
+application = FeedEventsMiddleware(django_application)
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import logging
+import random
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger("litreview.instrumentation")
+
+# metrics of the request being measured, None when it is not sampled
+current_metrics = ContextVar("current_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = perf_counter()
+        self.queries = []
+        self.template_time = 0.0
+
+    def record_query(self, sql, duration):
+        self.queries.append((sql, duration))
+
+    @property
+    def total_ms(self):
+        return (perf_counter() - self.start) * 1000
+
+    @property
+    def sql_ms(self):
+        return sum(duration for _, duration in self.queries) * 1000
+
+    @property
+    def template_ms(self):
+        return self.template_time * 1000
+
+    def duplicates(self, limit=3):
+        # the statements keep their placeholders, the same statement run
+        # with other parameters is counted as a duplicate
+        counts = Counter(sql for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common(limit)
+                if count > 1]
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, perf_counter() - start)
+
+
+def install_query_recorder():
+    # the connections belong to the thread running the queries, which is
+    # not the event loop's under ASGI. The recorder stays installed, it
+    # does nothing outside of the measured requests.
+    for connection in connections.all():
+        if record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(record_query)
+
+
+def is_sampled():
+    return random.random() < settings.REQUEST_INSTRUMENTATION_SAMPLE_RATE
+
+
+@contextmanager
+def measure():
+    metrics = RequestMetrics()
+    token = current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        current_metrics.reset(token)
+
+
+class InstrumentationMiddleware:
+    """
+    Measures a sample of the requests: wall time, number and time of the
+    SQL queries, template render time and most repeated statements. The
+    figures are sent in a Server-Timing header and a JSON log line, a
+    statement repeated N_PLUS_ONE_THRESHOLD times is logged as an N+1.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # marks the instance as a coroutine function for Django, as
+            # MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not is_sampled():
+            return self.get_response(request)
+        install_query_recorder()
+        with measure() as metrics:
+            response = self.get_response(request)
+        self.report(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        if not is_sampled():
+            return await self.get_response(request)
+        await sync_to_async(install_query_recorder)()
+        with measure() as metrics:
+            response = await self.get_response(request)
+        self.report(request, response, metrics)
+        return response
+
+    def report(self, request, response, metrics):
+        total_ms = metrics.total_ms
+        duplicates = metrics.duplicates()
+        response.headers["Server-Timing"] = ", ".join((
+            f'db;dur={metrics.sql_ms:.1f};desc="{len(metrics.queries)} '
+            f'queries"',
+            f"tpl;dur={metrics.template_ms:.1f}",
+            f"total;dur={total_ms:.1f}",
+        ))
+
+        n_plus_one = [
+            sql for sql, count in duplicates
+            if count >= settings.REQUEST_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD
+        ]
+        logger.log(
+            logging.WARNING if n_plus_one else logging.INFO,
+            json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "view": getattr(request.resolver_match, "view_name", None),
+                "status": response.status_code,
+                "total_ms": round(total_ms, 3),
+                "queries": len(metrics.queries),
+                "sql_ms": round(metrics.sql_ms, 3),
+                "template_ms": round(metrics.template_ms, 3),
+                "duplicates": [{"sql": sql, "count": count}
+                               for sql, count in duplicates],
+                "n_plus_one": n_plus_one,
+            }, ensure_ascii=False),
+        )
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """
+    The Django template backend, timing the rendering of the templates
+    for InstrumentationMiddleware. The included templates are rendered by
+    the engine and counted in the time of the template including them.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -0,0 +1,96 @@
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+# names made by ManifestStaticFilesStorage, e.g. style.55e7cbb9ba48.css
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.[^/]+$")
+
+ONE_YEAR = 60 * 60 * 24 * 365
+
+ENCODINGS = (
+    ("br", ".br"),
+    ("gzip", ".gz"),
+)
+
+
+def accepted_variant(request, path):
+    accepted = request.headers.get("Accept-Encoding", "")
+    for encoding, extension in ENCODINGS:
+        variant = path.with_name(path.name + extension)
+        if encoding in accepted and variant.is_file():
+            return encoding, variant
+    return None, path
+
+
+def find_file(document_root, path):
+    fullpath = Path(safe_join(document_root, path))
+    if not fullpath.is_file() or fullpath.suffix in (".gz", ".br"):
+        return None
+    return fullpath
+
+
+def serve(request, path, document_root=None, max_age=0):
+    """
+    Serves a media file with validators (ETag, Last-Modified) answering
+    unchanged files with a 304, the precompressed copy accepted by the
+    client if any, and a FileResponse which the WSGI server can send with
+    sendfile(). The browsers keep the file for max_age seconds.
+    """
+    fullpath = find_file(document_root,
+                         posixpath.normpath(path).lstrip("/"))
+    if fullpath is None:
+        raise Http404("Le fichier demandé n'existe pas.")
+    cache_control = f"public, max-age={max_age}" if max_age else "no-cache"
+    return file_response(request, fullpath, cache_control)
+
+
+def serve_static(request, path):
+    """
+    Serves a static file like serve(), the names containing a content hash
+    are cached for a year. Until collectstatic has filled STATIC_ROOT, the
+    files are found in STATICFILES_DIRS and the apps, with their plain
+    names.
+    """
+    path = posixpath.normpath(path).lstrip("/")
+    fullpath = find_file(settings.STATIC_ROOT, path)
+    if fullpath is None:
+        found = finders.find(path)
+        if found is None:
+            raise Http404("Le fichier demandé n'existe pas.")
+        fullpath = Path(found)
+    if HASHED_NAME.search(path):
+        cache_control = f"public, max-age={ONE_YEAR}, immutable"
+    else:
+        cache_control = "no-cache"
+    return file_response(request, fullpath, cache_control)
+
+
+def file_response(request, fullpath, cache_control):
+    encoding, served_path = accepted_variant(request, fullpath)
+    stat = served_path.stat()
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=int(stat.st_mtime))
+    if response is None:
+        content_type, _ = mimetypes.guess_type(str(fullpath))
+        response = FileResponse(
+            served_path.open("rb"),
+            content_type=content_type or "application/octet-stream",
+            filename=fullpath.name,
+        )
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Last-Modified"] = http_date(stat.st_mtime)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'litreview.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,7 +58,7 @@ ROOT_URLCONF = 'litreview.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'litreview.instrumentation.DjangoTemplates',
         'DIRS': [
             BASE_DIR.joinpath('templates'),
         ],
@@ -82,9 +84,89 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # seconds during which a thread keeps its connection between the
+        # requests, litreview/asgi.py sets it to 0 (see the comment there)
+        'CONN_MAX_AGE': int(os.environ.get('LITREVIEW_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Production tuning of SQLite, off unless LITREVIEW_SQLITE_TUNING=1: the
+# journal mode is stored in the database file, and WAL leaves -wal and -shm
+# files next to it, the db.sqlite3 of the repository included.
+SQLITE_TUNING = os.environ.get('LITREVIEW_SQLITE_TUNING') == '1'
+
+# Run by litreview.database on each new SQLite connection when SQLITE_TUNING
+# is set, see https://www.sqlite.org/pragma.html. With WAL the readers are
+# not blocked by a writer, and NORMAL only syncs the log at checkpoints.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    # milliseconds a writer waits for the lock before "database is locked"
+    'busy_timeout': 5000,
+    # negative values are in KiB
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+# Logging
+# https://docs.djangoproject.com/en/4.1/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'litreview.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Share of the requests measured by InstrumentationMiddleware, between 0
+# (disabled) and 1. The measures are sent in the Server-Timing header and
+# logged by "litreview.instrumentation".
+REQUEST_INSTRUMENTATION_SAMPLE_RATE = 0
+
+# Times a statement has to run in one request to be logged as an N+1.
+REQUEST_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# The file based cache can be used instead to share it between processes:
+# 'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+# 'LOCATION': BASE_DIR / 'cache',
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Sessions are read from the cache and written to the database as well,
+# a session missing from the cache is loaded from the database.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# The user of the session is read from the cache too, without its password
+# hash, until the user is saved. With several processes and a cache which
+# isn't shared between them, a save made by one process (e.g. a password
+# change) reaches the others after USER_CACHE_TIMEOUT.
+AUTHENTICATION_BACKENDS = [
+    'authentication.backends.CachedModelBackend',
+]
+
+# Seconds during which a user is cached.
+USER_CACHE_TIMEOUT = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -126,12 +208,20 @@ USE_TZ = False
 
 STATIC_URL = '/static/'
 
-if DEBUG:
-    STATICFILES_DIRS = [
-        BASE_DIR.joinpath('litreview/static'),
-    ]
-else:
-    STATIC_ROOT = BASE_DIR.joinpath('litreview/static')
+STATICFILES_DIRS = [
+    BASE_DIR.joinpath('litreview/static'),
+]
+
+# filled by "python manage.py collectstatic" with hashed and compressed files,
+# the files of STATICFILES_DIRS are served with their plain names until then
+STATIC_ROOT = BASE_DIR.joinpath('staticfiles')
+
+STATICFILES_STORAGE = 'litreview.staticfiles' \
+                      '.CompressedManifestStaticFilesStorage'
+
+# Seconds during which the browsers may keep an uploaded file
+# before revalidating it.
+MEDIA_MAX_AGE = 60 * 60 * 24
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
@@ -145,3 +235,50 @@ LOGIN_URL = 'login'
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR.joinpath('media/')
+
+# The upload of a ticket image is aborted past TICKET_IMAGE_MAX_SIZE (see
+# review.uploads.SizeLimitedUploadHandler).
+TICKET_IMAGE_MAX_SIZE = 5 * 1024 * 1024
+
+TICKET_IMAGE_MAX_PIXELS = 6000 * 4000
+
+# Threads downscaling the uploaded ticket images, 0 makes the copies
+# in the request once it is committed.
+IMAGE_RENDITION_WORKERS = 2
+
+# Deleted tickets are hidden at once, then deleted with their reviews and
+# image by a background thread, DELETE_SWEEP_BATCH_SIZE tickets per
+# transaction. False deletes them in the request once it is committed.
+DELETE_SWEEP_IN_BACKGROUND = True
+
+DELETE_SWEEP_BATCH_SIZE = 100
+
+# "python manage.py sweep_deleted" also removes the media files no ticket
+# refers to, except in these directories and the files younger than
+# MEDIA_GC_GRACE_PERIOD seconds, which may belong to a ticket being saved.
+MEDIA_GC_KEEP = ['backgrounds/']
+
+MEDIA_GC_GRACE_PERIOD = 60 * 60
+
+# Feed read from a precomputed inbox per user, filled when posts and follows
+# are created. Run "python manage.py rebuild_feed_inbox" after enabling it.
+FEED_INBOX = False
+
+# Seconds during which the pages of the feed and posts pages are cached,
+# they are invalidated as soon as a post or follow changes. 0 disables it.
+FEED_CACHE_TIMEOUT = 60 * 15
+
+# Seconds during which the follows of a user are cached, they are
+# invalidated as soon as a follow is created or deleted.
+FOLLOW_GRAPH_CACHE_TIMEOUT = 60 * 60 * 24
+
+# New posts pushed to the open feeds as Server-Sent Events, served at
+# FEED_EVENTS_PATH by litreview/asgi.py only. The broker reaches the
+# connections of its own process, the posts must be created by the same
+# ASGI process or the broker replaced by one shared between processes.
+FEED_EVENTS_PATH = '/feed/events/'
+
+FEED_EVENTS_BROKER = 'review.events.InProcessBroker'
+
+# Seconds between two comments sent on an idle connection.
+FEED_EVENTS_KEEPALIVE = 20
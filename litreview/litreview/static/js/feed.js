@@ -0,0 +1,21 @@
+// Adds the new posts announced by the server at the top of the feed.
+(function () {
+    const feed = document.getElementById("feed");
+    if (!feed || !feed.dataset.events || !window.EventSource) {
+        return;
+    }
+    const buttons = document.getElementById("feed-buttons");
+    const source = new EventSource(feed.dataset.events);
+
+    source.addEventListener("post", async function (event) {
+        const post = JSON.parse(event.data);
+        const selector = `[data-post="${post.post_type}-${post.post_id}"]`;
+        if (feed.querySelector(selector)) {
+            return;
+        }
+        const response = await fetch(post.url, {credentials: "same-origin"});
+        if (response.ok && !feed.querySelector(selector)) {
+            buttons.insertAdjacentHTML("afterend", await response.text());
+        }
+    });
+})();
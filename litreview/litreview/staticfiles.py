@@ -0,0 +1,64 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, only gzip copies are made then
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".map", ".svg", ".txt", ".html")
+
+
+def compress(content):
+    yield ".gz", gzip.compress(content, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield ".br", brotli.compress(content)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Static files stored under names containing the hash of their content,
+    with gzip (and brotli when installed) copies of the text files, served
+    by litreview.serving.serve.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if not dry_run and hashed_name \
+                    and not isinstance(processed, Exception) \
+                    and hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.save_compressed(hashed_name)
+            yield name, hashed_name, processed
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def keep_outside_urls(matchobj):
+            # style.css uses a background from the media files, which are
+            # not static files and keep their url
+            try:
+                return converter(matchobj)
+            except (ValueError, SuspiciousFileOperation):
+                return matchobj["matched"]
+
+        return keep_outside_urls
+
+    def save_compressed(self, name):
+        with self.open(name) as file:
+            content = file.read()
+        for extension, compressed in compress(content):
+            # a copy is only worth it if it is smaller
+            if len(compressed) < len(content):
+                with open(self.path(name + extension), "wb") as file:
+                    file.write(compressed)
+
+    def stored_name(self, name):
+        # files which were not collected yet (e.g. when running the tests)
+        # keep their plain name instead of failing the whole page
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
@@ -17,10 +17,10 @@ Including another URLconf
 from django.urls import path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.static import serve
 
 import authentication.views
 import review.views
+from litreview.serving import serve, serve_static
 
 urlpatterns = [
     path("", authentication.views.LoginPageView.as_view()),
@@ -28,7 +28,12 @@ urlpatterns = [
     path("signup/", authentication.views.SignupPage.as_view(), name="signup"),
     path("logout/", authentication.views.logout_user, name="logout"),
     path("feed/", review.views.Feed.as_view(), name="feed"),
+    path("feed/posts/<str:post_type>/<int:post_id>/",
+         review.views.PostSnippet.as_view(),
+         name="post-snippet"
+         ),
     path("posts/", review.views.PostsPage.as_view(), name="posts"),
+    path("search/", review.views.Search.as_view(), name="search"),
     path("ticket/create/",
          review.views.CreateTicket.as_view(),
          name="create-ticket"
@@ -56,6 +61,14 @@ urlpatterns = [
          name="delete-review"
          ),
     path("follows/", review.views.FollowPage.as_view(), name="follows"),
+    path("follows/import/",
+         review.views.ImportFollows.as_view(),
+         name="import-follows"
+         ),
+    path("follows/export/",
+         review.views.ExportFollows.as_view(),
+         name="export-follows"
+         ),
     path("follows/<int:follow_id>/delete/",
          review.views.DeleteFollow.as_view(),
          name="delete-follow"
@@ -68,11 +81,10 @@ if settings.DEBUG:
 else:
     urlpatterns += (
         re_path(r'^media/(?P<path>.*)$',
-                serve, {'document_root': settings.MEDIA_ROOT}
-                ),
-        re_path(r'^static/(?P<path>.*)$',
-                serve, {'document_root': settings.STATIC_ROOT}
+                serve, {'document_root': settings.MEDIA_ROOT,
+                        'max_age': settings.MEDIA_MAX_AGE}
                 ),
+        re_path(r'^static/(?P<path>.*)$', serve_static),
     )
 
 
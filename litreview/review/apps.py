@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ReviewConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'review'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from litreview import database  # noqa: F401
@@ -0,0 +1,124 @@
+from hashlib import md5
+from time import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def version_key(user_id):
+    return f"review:feed-version:{user_id}"
+
+
+def new_feed_version():
+    # the time of the change, sent as Last-Modified, and a random part for
+    # the changes made in the same second
+    return f"{int(time())}.{uuid4().hex}"
+
+
+def feed_version_time(version):
+    seconds, _, random_part = version.partition(".")
+    return int(seconds) if random_part else None
+
+
+def get_feed_version(user_id):
+    version = cache.get(version_key(user_id))
+    if version is None:
+        version = new_feed_version()
+        if not cache.add(version_key(user_id), version, None):
+            version = cache.get(version_key(user_id), version)
+    return version
+
+
+def followed_key(user_id):
+    return f"review:followed:{user_id}"
+
+
+def followers_key(user_id):
+    return f"review:followers:{user_id}"
+
+
+def invalidate_follow_graph(user_id, followed_user_ids):
+    cache.delete_many([followed_key(user_id),
+                       *(followers_key(followed_user_id)
+                         for followed_user_id in followed_user_ids)])
+
+
+async def aget_or_set(key, get_value, timeout):
+    # cache.aget_or_set() would call a synchronous default
+    value = await cache.aget(key)
+    if value is None:
+        value = await get_value()
+        await cache.aset(key, value, timeout)
+    return value
+
+
+def invalidate_feeds(user_ids):
+    # a new version makes every cached page of these users unreachable,
+    # the old entries expire on their own
+    version = new_feed_version()
+    cache.set_many({version_key(user_id): version
+                    for user_id in set(user_ids)}, None)
+
+
+class CachedKeys:
+    """
+    Keys of a post stream, counted and sliced through the cache like the
+    queryset they stand for, as used by PostPaginator and CursorPaginator.
+    """
+    ordered = True
+
+    def __init__(self, queryset, cache_key):
+        self.queryset = queryset
+        self.cache_key = cache_key
+
+    def count(self):
+        return cache.get_or_set(f"{self.cache_key}:count",
+                                self.queryset.count,
+                                settings.FEED_CACHE_TIMEOUT)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step:
+            return self.queryset[index]
+        return cache.get_or_set(
+            f"{self.cache_key}:{index.start}:{index.stop}",
+            lambda: list(self.queryset[index]),
+            settings.FEED_CACHE_TIMEOUT,
+        )
+
+
+class CachedStream:
+    """
+    Post stream of a user whose pages of keys are cached until the version
+    of the user's feed changes.
+    """
+
+    def __init__(self, stream, user_id, name):
+        self.stream = stream
+        self.prefix = f"review:{name}:{user_id}:{get_feed_version(user_id)}"
+
+    def cache_key(self, cursor=None, older=True):
+        position = md5(f"{cursor}:{older}".encode()).hexdigest()
+        return f"{self.prefix}:{position}"
+
+    def keys(self, cursor=None, older=True):
+        return CachedKeys(self.stream.keys(cursor, older),
+                          self.cache_key(cursor, older))
+
+    def hydrate(self, keys):
+        return self.stream.hydrate(keys)
+
+    async def acount(self):
+        return await aget_or_set(f"{self.cache_key()}:count",
+                                 self.stream.acount,
+                                 settings.FEED_CACHE_TIMEOUT)
+
+    async def akeys(self, start, stop, cursor=None, older=True):
+        return await aget_or_set(
+            f"{self.cache_key(cursor, older)}:{start}:{stop}",
+            lambda: self.stream.akeys(start, stop, cursor, older),
+            settings.FEED_CACHE_TIMEOUT,
+        )
+
+    async def ahydrate(self, keys):
+        return await self.stream.ahydrate(keys)
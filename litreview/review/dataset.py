@@ -0,0 +1,186 @@
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from authentication.models import User
+from .models import Ticket, Review, UserFollows, FeedEntry
+from .search import rebuild_search_index
+from .views import get_viewable_tickets, get_viewable_reviews
+
+PASSWORD = "Hello1234!"
+BATCH_SIZE = 500
+# the tickets with an image share a few generated covers
+IMAGE_POOL_SIZE = 20
+
+WORDS = ("livre", "roman", "auteur", "histoire", "critique", "lecture",
+         "chapitre", "personnage", "intrigue", "style", "poésie", "essai",
+         "biographie", "aventure", "science", "voyage", "mémoire", "nuit")
+
+
+@contextmanager
+def original_timestamps(*models):
+    # auto_now and auto_now_add would replace the generated dates
+    fields = [field for model in models for field in model._meta.fields
+              if getattr(field, "auto_now", False)
+              or getattr(field, "auto_now_add", False)]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class DatasetGenerator:
+    """
+    Builds a reproducible social graph: users, follows drawn from a uniform
+    or a Zipf distribution (a few very followed users), tickets, reviews and
+    images spread over a period of time.
+    """
+
+    def __init__(self, users=100, follows=20, distribution="zipf",
+                 zipf_exponent=1.1, tickets=10, review_ratio=0.6,
+                 image_ratio=0.1, days=365, seed=0, prefix="user"):
+        self.users = users
+        self.follows = min(follows, users - 1)
+        self.distribution = distribution
+        self.zipf_exponent = zipf_exponent
+        self.tickets = tickets
+        self.review_ratio = review_ratio
+        self.image_ratio = image_ratio
+        self.days = days
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.end = datetime(2023, 5, 1)
+
+    def words(self, number):
+        return " ".join(self.random.choices(WORDS, k=number)).capitalize()
+
+    def time_created(self):
+        return self.end - timedelta(seconds=self.random.randrange(
+            self.days * 24 * 60 * 60
+        ))
+
+    def create_users(self):
+        # hashing is slow on purpose, every user shares the same hash
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (User(username=f"{self.prefix}{number}", password=password)
+             for number in range(self.users)),
+            batch_size=BATCH_SIZE,
+        )
+        return list(User.objects.filter(
+            username__startswith=self.prefix
+        ).order_by("id").values_list("id", flat=True))
+
+    def followed_users(self, user_ids, user_id, cum_weights):
+        followed = set()
+        while len(followed) < self.follows:
+            followed.update(
+                candidate for candidate in self.random.choices(
+                    user_ids, cum_weights=cum_weights,
+                    k=self.follows - len(followed)
+                ) if candidate != user_id
+            )
+        return followed
+
+    def create_follows(self, user_ids):
+        # with zipf, the n-th user is followed about 1 / n^s as much
+        # as the first one
+        cum_weights = None
+        if self.distribution == "zipf":
+            cum_weights = list(accumulate(
+                1 / (rank + 1) ** self.zipf_exponent
+                for rank in range(len(user_ids))
+            ))
+        UserFollows.objects.bulk_create(
+            (UserFollows(user_id=user_id, followed_user_id=followed_user)
+             for user_id in user_ids
+             for followed_user in self.followed_users(user_ids, user_id,
+                                                      cum_weights)),
+            batch_size=BATCH_SIZE,
+        )
+
+    def create_images(self):
+        names = []
+        for index in range(IMAGE_POOL_SIZE):
+            content = BytesIO()
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            Image.new("RGB", (800, 1200), color).save(content, "JPEG")
+            names.append(default_storage.save(
+                f"synthetic/cover-{index}.jpg",
+                ContentFile(content.getvalue()),
+            ))
+        return names
+
+    def create_tickets(self, user_ids):
+        images = self.create_images() if self.image_ratio else []
+        tickets = []
+        for user_id in user_ids:
+            for _ in range(self.tickets):
+                image = None
+                if self.random.random() < self.image_ratio:
+                    image = self.random.choice(images)
+                time_created = self.time_created()
+                tickets.append(Ticket(
+                    user_id=user_id,
+                    title=self.words(4),
+                    description=self.words(40),
+                    image=image,
+                    time_created=time_created,
+                    time_updated=time_created,
+                ))
+        Ticket.objects.bulk_create(tickets, batch_size=BATCH_SIZE)
+
+    def create_reviews(self, user_ids):
+        tickets = list(Ticket.objects.filter(
+            user__in=user_ids
+        ).order_by("id").values_list("id", "time_created"))
+        reviewed = self.random.sample(
+            tickets, round(len(tickets) * self.review_ratio)
+        )
+        reviews = []
+        for ticket_id, ticket_time in reviewed:
+            time_created = ticket_time + timedelta(
+                minutes=self.random.randrange(1, 60 * 24 * 7)
+            )
+            reviews.append(Review(
+                ticket_id=ticket_id,
+                user_id=self.random.choice(user_ids),
+                rating=self.random.randrange(6),
+                headline=self.words(4),
+                body=self.words(120),
+                time_created=time_created,
+                time_updated=time_created,
+            ))
+        Review.objects.bulk_create(reviews, batch_size=BATCH_SIZE)
+        # bulk_create skips ReviewManager.create
+        Ticket.objects.refresh_review_stats(
+            [ticket_id for ticket_id, _ in reviewed]
+        )
+
+    def generate(self):
+        with transaction.atomic(), original_timestamps(Ticket, Review):
+            user_ids = self.create_users()
+            self.create_follows(user_ids)
+            self.create_tickets(user_ids)
+            self.create_reviews(user_ids)
+            # bulk_create sends no post_save
+            rebuild_search_index()
+            if settings.FEED_INBOX:
+                for user in User.objects.filter(id__in=user_ids).iterator():
+                    FeedEntry.objects.rebuild(user,
+                                              get_viewable_tickets(user),
+                                              get_viewable_reviews(user))
+        return user_ids
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from importlib import import_module
+from io import BytesIO
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.asgi import ASGIRequest
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+# events kept for a connection which doesn't read them, the next ones are
+# dropped and shown by the next reload of the feed
+MAX_PENDING_EVENTS = 100
+
+
+class Subscription:
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(MAX_PENDING_EVENTS)
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Delivers the events published by any thread to the connections
+    subscribed in the event loop of this process. A broker shared between
+    processes (e.g. Redis pub/sub) can replace it in FEED_EVENTS_BROKER by
+    providing subscribe() and publish().
+    """
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions[subscription.user_id]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.user_id]
+
+    def publish(self, user_ids, event):
+        with self.lock:
+            subscriptions = [subscription for user_id in set(user_ids)
+                             for subscription in
+                             self.subscriptions.get(user_id, ())]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver,
+                                                       event)
+            except RuntimeError:
+                # the loop of the connection is closed
+                pass
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.FEED_EVENTS_BROKER)()
+
+
+def publish_new_post(post_type, post_id, user_ids):
+    get_broker().publish(user_ids, {
+        "post_type": post_type,
+        "post_id": post_id,
+        "url": reverse("post-snippet", args=[post_type, post_id]),
+    })
+
+
+def format_event(event):
+    return f"event: post\ndata: {json.dumps(event)}\n\n".encode()
+
+
+async def authenticate(scope):
+    request = ASGIRequest(scope, BytesIO())
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    return await sync_to_async(get_user)(request)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+class FeedEventsMiddleware:
+    """
+    ASGI application streaming the new posts of the feed of the logged in
+    user as Server-Sent Events at FEED_EVENTS_PATH, the other requests go
+    to Django. A connection waits in the event loop without a thread,
+    Django 4.1 would iterate a StreamingHttpResponse synchronously.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" \
+                or scope["path"] != settings.FEED_EVENTS_PATH:
+            return await self.application(scope, receive, send)
+
+        user = await authenticate(scope)
+        if not user.is_authenticated:
+            await send({"type": "http.response.start", "status": 403,
+                        "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        subscription = get_broker().subscribe(user.id)
+        disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+        event = asyncio.ensure_future(subscription.get())
+        try:
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [
+                            (b"content-type", b"text/event-stream"),
+                            (b"cache-control", b"no-cache"),
+                            # proxies must not buffer the stream
+                            (b"x-accel-buffering", b"no"),
+                        ]})
+            await send({"type": "http.response.body",
+                        "body": b"retry: 5000\n\n", "more_body": True})
+            while True:
+                done, _ = await asyncio.wait(
+                    {disconnect, event},
+                    timeout=settings.FEED_EVENTS_KEEPALIVE,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnect in done:
+                    break
+                if event in done:
+                    body = format_event(event.result())
+                    event = asyncio.ensure_future(subscription.get())
+                else:
+                    # a comment keeps the idle connection open
+                    body = b":\n\n"
+                await send({"type": "http.response.body", "body": body,
+                            "more_body": True})
+        finally:
+            disconnect.cancel()
+            event.cancel()
+            subscription.close()
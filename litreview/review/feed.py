@@ -0,0 +1,317 @@
+import asyncio
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator, Page, EmptyPage, \
+    PageNotAnInteger
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.db.models import CharField, F, Q, Value
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+
+TICKET = "ticket"
+REVIEW = "review"
+
+POSTS_PER_PAGE = 5
+
+NEWEST_FIRST = ("-time_created", "-post_type", "-post_id")
+OLDEST_FIRST = ("time_created", "post_type", "post_id")
+
+
+def post_keys(queryset, post_type):
+    return queryset.order_by().annotate(
+        post_type=Value(post_type, output_field=CharField())
+    ).values("time_created", "post_type", post_id=F("id"))
+
+
+def keyset_filter(queryset, post_type, cursor, older):
+    # keeps the posts whose key (time_created, post_type, id) comes after
+    # the cursor in the feed (older) or before it (newer), written as a
+    # range on time_created so that the (user, time_created) index is used
+    time_created, cursor_type, cursor_id = cursor
+    lookup = "lt" if older else "gt"
+    if post_type == cursor_type:
+        return queryset.filter(**{f"time_created__{lookup}e": time_created}) \
+            .filter(Q(**{f"time_created__{lookup}": time_created}) |
+                    Q(**{f"id__{lookup}": cursor_id}))
+    if (post_type < cursor_type) == older:
+        # posts of this type at the same time are on the cursor's side
+        return queryset.filter(**{f"time_created__{lookup}e": time_created})
+    return queryset.filter(**{f"time_created__{lookup}": time_created})
+
+
+def post_ids(keys, post_type):
+    return [key["post_id"] for key in keys if key["post_type"] == post_type]
+
+
+def ordered_posts(keys, posts):
+    return [
+        posts[key["post_type"]][key["post_id"]]
+        for key in keys
+        if key["post_id"] in posts[key["post_type"]]
+    ]
+
+
+def hydrate_posts(keys, tickets, reviews):
+    ticket_ids = post_ids(keys, TICKET)
+    review_ids = post_ids(keys, REVIEW)
+    posts = {
+        TICKET: tickets.in_bulk(ticket_ids) if ticket_ids else {},
+        REVIEW: reviews.in_bulk(review_ids) if review_ids else {},
+    }
+    return ordered_posts(keys, posts)
+
+
+async def ain_bulk(queryset, ids):
+    return await queryset.ain_bulk(ids) if ids else {}
+
+
+async def ahydrate_posts(keys, tickets, reviews):
+    # the tickets and the reviews are loaded concurrently
+    ticket_posts, review_posts = await asyncio.gather(
+        ain_bulk(tickets, post_ids(keys, TICKET)),
+        ain_bulk(reviews, post_ids(keys, REVIEW)),
+    )
+    return ordered_posts(keys, {TICKET: ticket_posts, REVIEW: review_posts})
+
+
+def order_by_sql(ordering):
+    return ", ".join(
+        f"{connection.ops.quote_name(field.lstrip('-'))} "
+        f"{'DESC' if field.startswith('-') else 'ASC'}"
+        for field in ordering
+    )
+
+
+def side_sql(keys, ordering, stop):
+    # a side holds a single post type
+    keys = keys.order_by(*(field for field in ordering
+                           if not field.endswith("post_type")))
+    try:
+        return keys[:stop].query.sql_with_params()
+    except EmptyResultSet:
+        return None
+
+
+class StreamKeys:
+    """
+    Keys of the posts of a PostStream, counted and sliced in SQL like the
+    queryset of their UNION. A slice is pushed into each side of the UNION
+    as an ORDER BY and a LIMIT, so that the union sorts at most twice the
+    end of the slice instead of every post visible by the user, and a side
+    reading the posts of a single user stops at the end of the slice in
+    its (user, time_created) index.
+    """
+    ordered = True
+
+    def __init__(self, tickets, reviews, older):
+        self.tickets = post_keys(tickets, TICKET)
+        self.reviews = post_keys(reviews, REVIEW)
+        self.ordering = NEWEST_FIRST if older else OLDEST_FIRST
+
+    def union(self):
+        return self.tickets.union(self.reviews, all=True) \
+            .order_by(*self.ordering)
+
+    def count(self):
+        return self.union().count()
+
+    async def acount(self):
+        return await self.union().acount()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step or index.stop is None:
+            return self.union()[index]
+        start = index.start or 0
+        # Django doesn't slice the sides of a UNION on SQLite, they are
+        # selected from subqueries. A side which can't match any post
+        # (e.g. no followed user) has no SQL.
+        sides = [side_sql(side, self.ordering, index.stop)
+                 for side in (self.tickets, self.reviews)]
+        sides = [side for side in sides if side]
+        if not sides:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                " UNION ALL ".join(f"SELECT * FROM ({sql})"
+                                   for sql, _ in sides)
+                + f" ORDER BY {order_by_sql(self.ordering)}"
+                f" LIMIT %s OFFSET %s",
+                [*(param for _, params in sides for param in params),
+                 index.stop - start, start],
+            )
+            return [{"time_created": time_created,
+                     "post_type": post_type,
+                     "post_id": post_id}
+                    for time_created, post_type, post_id in cursor.fetchall()]
+
+
+class PostStream:
+    """
+    Tickets and reviews merged and ordered by the database with a UNION,
+    only the keys of the posts are selected.
+    """
+
+    def __init__(self, tickets, reviews):
+        self.tickets = tickets
+        self.reviews = reviews
+
+    def keys(self, cursor=None, older=True):
+        tickets = self.tickets
+        reviews = self.reviews
+        if cursor:
+            tickets = keyset_filter(tickets, TICKET, cursor, older)
+            reviews = keyset_filter(reviews, REVIEW, cursor, older)
+        return StreamKeys(tickets, reviews, older)
+
+    def hydrate(self, keys):
+        return hydrate_posts(keys, self.tickets, self.reviews)
+
+    async def acount(self):
+        return await self.keys().acount()
+
+    async def akeys(self, start, stop, cursor=None, older=True):
+        keys = self.keys(cursor, older)
+        return await sync_to_async(lambda: list(keys[start:stop]))()
+
+    async def ahydrate(self, keys):
+        return await ahydrate_posts(keys, self.tickets, self.reviews)
+
+
+class InboxStream(PostStream):
+    """
+    Posts read from the precomputed feed entries of a user, a single range
+    scan on the (user, time_created) index.
+    """
+
+    def __init__(self, entries, tickets, reviews):
+        super().__init__(tickets, reviews)
+        self.entries = entries
+
+    def keys(self, cursor=None, older=True):
+        entries = self.entries
+        if cursor:
+            time_created, post_type, post_id = cursor
+            lookup = "lt" if older else "gt"
+            entries = entries.filter(
+                **{f"time_created__{lookup}e": time_created}
+            ).filter(
+                Q(**{f"time_created__{lookup}": time_created}) |
+                Q(**{f"post_type__{lookup}": post_type}) |
+                Q(**{"post_type": post_type, f"post_id__{lookup}": post_id})
+            )
+        return entries.values("time_created", "post_type", "post_id") \
+            .order_by(*(NEWEST_FIRST if older else OLDEST_FIRST))
+
+
+class PostPaginator(Paginator):
+    """
+    Paginates a post stream in SQL (LIMIT / OFFSET), then loads only the
+    posts of the requested page.
+    """
+
+    def __init__(self, stream, per_page=POSTS_PER_PAGE, **kwargs):
+        self.stream = stream
+        super().__init__(stream.keys(), per_page, **kwargs)
+
+    def _get_page(self, keys, number, paginator):
+        return super()._get_page(self.stream.hydrate(keys), number, paginator)
+
+    async def aget_key_page(self, number):
+        # same page as get_page, holding the keys of the posts which are
+        # hydrated by the caller with stream.ahydrate()
+        self.count = await self.stream.acount()
+        try:
+            number = self.validate_number(number)
+        except PageNotAnInteger:
+            number = 1
+        except EmptyPage:
+            number = self.num_pages
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        return Page(await self.stream.akeys(bottom, top), number, self)
+
+
+def encode_cursor(key):
+    time_created = key["time_created"].isoformat()
+    value = f"{time_created}|{key['post_type']}|{key['post_id']}"
+    return urlsafe_base64_encode(value.encode())
+
+
+def decode_cursor(token):
+    # an invalid token is treated as no token at all, like Paginator.get_page
+    # does with an invalid page number
+    try:
+        time_created, post_type, post_id = \
+            urlsafe_base64_decode(token).decode().split("|")
+        if post_type not in (TICKET, REVIEW):
+            return None
+        return datetime.fromisoformat(time_created), post_type, int(post_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over a post stream: a page is located from the key of
+    its neighbour instead of an offset, so any page costs the same as the
+    first one and the stream is never counted.
+    """
+
+    def __init__(self, stream, per_page=POSTS_PER_PAGE):
+        self.stream = stream
+        self.per_page = per_page
+
+    def get_page(self, after=None, before=None):
+        cursor, older = self.position(after, before)
+        # one extra key tells whether there is another page further on
+        keys = list(self.stream.keys(cursor, older)[:self.per_page + 1])
+        page = self.key_page(keys, cursor, older)
+        page.object_list = self.stream.hydrate(page.object_list)
+        return page
+
+    async def aget_key_page(self, after=None, before=None):
+        cursor, older = self.position(after, before)
+        keys = await self.stream.akeys(0, self.per_page + 1, cursor, older)
+        return self.key_page(keys, cursor, older)
+
+    def position(self, after, before):
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        return after or before, before is None
+
+    def key_page(self, keys, cursor, older):
+        has_more = len(keys) > self.per_page
+        keys = keys[:self.per_page]
+        if not older:
+            keys.reverse()
+
+        next_cursor = previous_cursor = None
+        if keys:
+            if has_more or not older:
+                next_cursor = encode_cursor(keys[-1])
+            if cursor and (has_more or older):
+                previous_cursor = encode_cursor(keys[0])
+
+        return CursorPage(keys, next_cursor, previous_cursor)
@@ -0,0 +1,29 @@
+FOLLOWED = "followed"
+ALREADY_FOLLOWED = "already_followed"
+UNKNOWN_USER = "unknown_user"
+OWN_USERNAME = "own_username"
+
+STATUS_LABELS = {
+    FOLLOWED: "ajouté à votre liste de suivi",
+    ALREADY_FOLLOWED: "déjà suivi",
+    UNKNOWN_USER: "aucun utilisateur ne correspond à ce nom",
+    OWN_USERNAME: "vous ne pouvez pas vous suivre vous même",
+}
+
+# names accepted in one import, they are resolved in a single query
+MAX_IMPORTED_FOLLOWS = 5000
+# bytes of MAX_IMPORTED_FOLLOWS names of 150 characters with Windows line
+# endings, checked before the file is read.
+MAX_IMPORT_FILE_SIZE = MAX_IMPORTED_FOLLOWS * (150 + 2)
+
+
+def parse_usernames(text):
+    # one username per line, the blank lines and the repeated names
+    # are skipped
+    return list(dict.fromkeys(
+        line.strip() for line in text.splitlines() if line.strip()
+    ))
+
+
+def format_usernames(usernames):
+    return "".join(f"{username}\n" for username in usernames)
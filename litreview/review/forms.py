@@ -1,6 +1,19 @@
 from django import forms
 
 from . import models
+from .follows import parse_usernames, MAX_IMPORTED_FOLLOWS, \
+    MAX_IMPORT_FILE_SIZE
+from .uploads import validate_image_size, validate_image_dimensions
+
+
+class TicketImageField(forms.ImageField):
+    def to_python(self, data):
+        # the size and the dimensions are checked before Pillow opens
+        # and verifies the whole image
+        if data not in self.empty_values:
+            validate_image_size(data)
+            validate_image_dimensions(data)
+        return super().to_python(data)
 
 
 class TicketForm(forms.ModelForm):
@@ -13,14 +26,18 @@ class TicketForm(forms.ModelForm):
         labels = {
             "title": "Titre"
         }
+        field_classes = {
+            "image": TicketImageField
+        }
 
 
 class ReviewForm(forms.ModelForm):
     CHOICES = [(number, number) for number in range(6)]
-    rating = forms.ChoiceField(choices=CHOICES,
-                               widget=forms.RadioSelect(),
-                               label="Note"
-                               )
+    rating = forms.TypedChoiceField(choices=CHOICES,
+                                    coerce=int,
+                                    widget=forms.RadioSelect(),
+                                    label="Note"
+                                    )
 
     class Meta:
         model = models.Review
@@ -39,3 +56,33 @@ class FollowForm(forms.Form):
         widget=forms.TextInput(
             attrs={"placeholder": "Nom d'utilisateur"})
         )
+
+
+class FollowImportForm(forms.Form):
+    usernames = forms.FileField(
+        label="Fichier",
+        help_text="Un nom d'utilisateur par ligne, comme dans l'export."
+    )
+
+    def clean_usernames(self):
+        file = self.cleaned_data["usernames"]
+        if file.size > MAX_IMPORT_FILE_SIZE:
+            raise forms.ValidationError(
+                f"Le fichier ne doit pas dépasser "
+                f"{MAX_IMPORT_FILE_SIZE // 1000} Ko.",
+                code="file_too_large",
+            )
+        try:
+            usernames = parse_usernames(file.read().decode("utf-8-sig"))
+        except UnicodeDecodeError:
+            raise forms.ValidationError(
+                "Le fichier doit être un texte encodé en UTF-8.",
+                code="invalid_encoding",
+            )
+        if len(usernames) > MAX_IMPORTED_FOLLOWS:
+            raise forms.ValidationError(
+                f"Le fichier ne doit pas dépasser "
+                f"{MAX_IMPORTED_FOLLOWS} noms d'utilisateur.",
+                code="too_many_usernames",
+            )
+        return usernames
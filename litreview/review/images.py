@@ -0,0 +1,85 @@
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .workers import schedule
+
+# images are shown at most 200px wide (see main.scss), the larger copies
+# are for high density screens
+RENDITION_WIDTHS = (200, 400, 800)
+# format given to Pillow, file extension
+RENDITION_FORMATS = (
+    ("WEBP", "webp"),
+    ("JPEG", "jpg"),
+)
+
+
+def rendition_name(name, width, extension):
+    path = PurePosixPath(name)
+    return str(PurePosixPath("renditions") / path.parent /
+               f"{path.stem}-{width}w.{extension}")
+
+
+def save_rendition(image, name, image_format):
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    content = BytesIO()
+    image.save(content, image_format, quality=80)
+    # the name is derived from the original, an older file is replaced
+    # instead of being saved under a random suffix
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(content.getvalue()))
+
+
+def make_renditions(ticket_id, name):
+    from .models import Ticket
+
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        widths = [width for width in RENDITION_WIDTHS if width < image.width]
+        if not widths:
+            return
+        # lets the JPEG decoder skip the resolution we don't need
+        image.draft(None, (widths[-1],
+                           widths[-1] * image.height // image.width))
+        image.load()
+
+    for width in widths:
+        resized = image.copy()
+        resized.thumbnail((width, image.height), Image.LANCZOS)
+        for image_format, extension in RENDITION_FORMATS:
+            save_rendition(resized,
+                           rendition_name(name, width, extension),
+                           image_format)
+
+    # time_updated is bumped so that the cached snippets are rendered
+    # again with the renditions
+    updated = Ticket.objects.filter(id=ticket_id, image=name).update(
+        image_widths=",".join(str(width) for width in widths),
+        time_updated=timezone.now(),
+    )
+    if updated:
+        # the pages showing the ticket change with its srcset and must not
+        # be answered with 304 Not Modified
+        Ticket.objects.invalidate_viewers(ticket_id)
+
+
+def schedule_renditions(ticket):
+    schedule("renditions", settings.IMAGE_RENDITION_WORKERS,
+             make_renditions, ticket.id, ticket.image.name)
+
+
+def get_srcset(ticket, extension):
+    urls = (
+        (default_storage.url(
+            rendition_name(ticket.image.name, width, extension)
+        ), width)
+        for width in ticket.rendition_widths
+    )
+    return ", ".join(f"{url} {width}w" for url, width in urls)
@@ -0,0 +1,153 @@
+import json
+import statistics
+import subprocess
+import tracemalloc
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, \
+    setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from authentication.models import User
+from review.dataset import DatasetGenerator
+from review.feed import PostPaginator
+from review.models import Ticket
+from review.views import get_feed_stream
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Measures the latency, the number of queries and the peak " \
+           "memory of the review views on synthetic datasets of several " \
+           "sizes, in a throwaway test database. Prints JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+",
+                            default=[100, 1000],
+                            help="Numbers of users of the datasets.")
+        parser.add_argument("--follows", type=int, default=20)
+        parser.add_argument("--tickets", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=20,
+                            help="Measured requests for each view.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--warm-cache", action="store_true",
+                            help="Keep the cache between the requests.")
+        parser.add_argument("--output",
+                            help="File to write the JSON to.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                           serialize=False)
+        try:
+            with TemporaryDirectory() as media, \
+                    override_settings(MEDIA_ROOT=media,
+                                      IMAGE_RENDITION_WORKERS=0):
+                datasets = [self.run_dataset(size, options)
+                            for size in options["sizes"]]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = json.dumps({
+            "commit": git_commit(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "repeat": options["repeat"],
+            "warm_cache": options["warm_cache"],
+            "datasets": datasets,
+        }, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(report + "\n")
+        else:
+            self.stdout.write(report)
+
+    def run_dataset(self, size, options):
+        call_command("flush", interactive=False, verbosity=0)
+        cache.clear()
+        DatasetGenerator(users=size,
+                         follows=options["follows"],
+                         tickets=options["tickets"],
+                         seed=options["seed"]).generate()
+
+        # the most followed user of the zipf distribution
+        user = User.objects.order_by("id").first()
+        client = Client()
+        ticket = Ticket.objects.filter(user=user).first()
+        last_page = PostPaginator(get_feed_stream(user)).num_pages
+        ticket_data = {"title": "Ticket", "description": "Description"}
+        review_data = {"headline": "Critique", "rating": 3, "body": "Corps"}
+        requests = {
+            "feed": lambda: client.get(reverse("feed")),
+            "feed_last_page": lambda: client.get(reverse("feed"),
+                                                 {"page": last_page}),
+            "posts": lambda: client.get(reverse("posts")),
+            "follows": lambda: client.get(reverse("follows")),
+            "create_ticket": lambda: client.post(reverse("create-ticket"),
+                                                 ticket_data),
+            "update_ticket": lambda: client.post(
+                reverse("update-ticket", args=[ticket.id]), ticket_data
+            ),
+            "create_review": lambda: client.post(
+                reverse("create-review"), {**ticket_data, **review_data}
+            ),
+        }
+        views = {name: self.measure(client, user, request, options)
+                 for name, request in requests.items()}
+        return {
+            "users": size,
+            "follows": options["follows"],
+            "tickets": Ticket.objects.count(),
+            "views": views,
+        }
+
+    def measure(self, client, user, request, options):
+        durations = []
+        for _ in range(options["repeat"]):
+            if not options["warm_cache"]:
+                cache.clear()
+            client.force_login(user)
+            with CaptureQueriesContext(connection) as queries:
+                start = perf_counter()
+                response = request()
+                durations.append((perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{response.status_code} response.")
+            query_count = len(queries)
+
+        # measured apart, tracing the allocations slows the request down
+        if not options["warm_cache"]:
+            cache.clear()
+        client.force_login(user)
+        tracemalloc.start()
+        request()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "mean_ms": round(statistics.mean(durations), 3),
+            "median_ms": round(statistics.median(durations), 3),
+            "p95_ms": round(statistics.quantiles(durations, n=20)[-1], 3)
+            if len(durations) > 1 else round(durations[0], 3),
+            "queries": query_count,
+            "peak_memory_kib": round(peak / 1024, 1),
+        }
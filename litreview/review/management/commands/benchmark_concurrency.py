@@ -0,0 +1,210 @@
+import json
+import statistics
+from http.client import HTTPConnection, HTTPException
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, \
+    WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from authentication.models import User
+from review.dataset import DatasetGenerator
+from .benchmark import git_commit
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def session_headers(user):
+    client = Client()
+    client.force_login(user)
+    session = client.cookies[settings.SESSION_COOKIE_NAME].value
+    csrf_token = get_random_string(32)
+    return {
+        "Cookie": f"{settings.SESSION_COOKIE_NAME}={session}; "
+                  f"{settings.CSRF_COOKIE_NAME}={csrf_token}",
+        "X-CSRFToken": csrf_token,
+    }
+
+
+def read_feed(http, headers):
+    http.request("GET", reverse("feed"), headers=headers)
+    response = http.getresponse()
+    response.read()
+    return response.status
+
+
+def create_ticket(http, headers):
+    body = urlencode({"title": "Ticket", "description": "Description"})
+    http.request("POST", reverse("create-ticket"), body, {
+        **headers,
+        "Content-Type": "application/x-www-form-urlencoded",
+    })
+    response = http.getresponse()
+    response.read()
+    return response.status
+
+
+def load(port, headers, send, deadline):
+    # each client keeps its HTTP connection, so that a server thread (and
+    # its database connection) serves all of its requests
+    http = HTTPConnection("127.0.0.1", port)
+    latencies = []
+    errors = 0
+    try:
+        while perf_counter() < deadline:
+            start = perf_counter()
+            try:
+                status = send(http, headers)
+            except (HTTPException, OSError):
+                http.close()
+                status = None
+            if status is None or status >= 400:
+                errors += 1
+            else:
+                latencies.append((perf_counter() - start) * 1000)
+    finally:
+        http.close()
+    return latencies, errors
+
+
+def summarize(results, duration):
+    latencies = [latency for result, _ in results for latency in result]
+    errors = sum(error for _, error in results)
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(latencies),
+        "per_second": round(len(latencies) / duration, 1),
+        "median_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(statistics.quantiles(latencies, n=20)[-1], 3)
+        if len(latencies) > 1 else round(latencies[0], 3),
+        "errors": errors,
+    }
+
+
+class Command(BaseCommand):
+    help = "Loads a threaded WSGI server with concurrent feed readers and " \
+           "ticket writers, with the default SQLite settings then with " \
+           "SQLITE_PRAGMAS and CONN_MAX_AGE, on a throwaway database " \
+           "file. Prints JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8,
+                            help="Threads loading the feed.")
+        parser.add_argument("--writers", type=int, default=2,
+                            help="Threads creating tickets.")
+        parser.add_argument("--duration", type=float, default=10,
+                            help="Seconds of load for each profile.")
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--follows", type=int, default=20)
+        parser.add_argument("--tickets", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output",
+                            help="File to write the JSON to.")
+
+    def handle(self, *args, **options):
+        profiles = {
+            # the journal mode is stored in the database file, the default
+            # one has to be set back explicitly
+            "default": ({"journal_mode": "DELETE"}, 0),
+            "tuned": (settings.SQLITE_PRAGMAS,
+                      connection.settings_dict["CONN_MAX_AGE"] or 60),
+        }
+        old_name = connection.settings_dict["NAME"]
+        old_max_age = connection.settings_dict["CONN_MAX_AGE"]
+        old_test_name = connection.settings_dict["TEST"]["NAME"]
+        with TemporaryDirectory() as directory, \
+                override_settings(FEED_CACHE_TIMEOUT=0,
+                                  REQUEST_INSTRUMENTATION_SAMPLE_RATE=0):
+            # a file, the in-memory test database can't be shared by the
+            # threads of the server
+            connection.settings_dict["TEST"]["NAME"] = \
+                str(Path(directory) / "benchmark.sqlite3")
+            connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                               serialize=False)
+            try:
+                DatasetGenerator(users=options["users"],
+                                 follows=options["follows"],
+                                 tickets=options["tickets"],
+                                 image_ratio=0,
+                                 seed=options["seed"]).generate()
+                results = {
+                    name: self.run_profile(pragmas, max_age, options)
+                    for name, (pragmas, max_age) in profiles.items()
+                }
+            finally:
+                connection.settings_dict["CONN_MAX_AGE"] = old_max_age
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                connection.settings_dict["TEST"]["NAME"] = old_test_name
+
+        report = json.dumps({
+            "commit": git_commit(),
+            "readers": options["readers"],
+            "writers": options["writers"],
+            "duration_s": options["duration"],
+            "users": options["users"],
+            "profiles": results,
+        }, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(report + "\n")
+        else:
+            self.stdout.write(report)
+
+    def run_profile(self, pragmas, max_age, options):
+        connection.close()
+        with override_settings(SQLITE_TUNING=True, SQLITE_PRAGMAS=pragmas):
+            # read by the connections opened by the threads of the server
+            connection.settings_dict["CONN_MAX_AGE"] = max_age
+            connection.ensure_connection()
+
+            users = list(User.objects.order_by("id")[
+                :options["readers"] + options["writers"]
+            ])
+            clients = [(read_feed, session_headers(user))
+                       for user in users[:options["readers"]]]
+            clients += [(create_ticket, session_headers(user))
+                        for user in users[options["readers"]:]]
+
+            server = ThreadedWSGIServer(("127.0.0.1", 0), QuietRequestHandler,
+                                        allow_reuse_address=False)
+            server.set_app(get_internal_wsgi_application())
+            Thread(target=server.serve_forever, daemon=True).start()
+            port = server.server_address[1]
+            try:
+                deadline = perf_counter() + options["duration"]
+                with ThreadPoolExecutor(len(clients)) as executor:
+                    futures = [
+                        (send, executor.submit(load, port, headers, send,
+                                               deadline))
+                        for send, headers in clients
+                    ]
+                    results = [(send, future.result())
+                               for send, future in futures]
+            finally:
+                server.shutdown()
+                server.server_close()
+            connection.close()
+
+        return {
+            "pragmas": pragmas,
+            "conn_max_age": max_age,
+            "reads": summarize([result for send, result in results
+                                if send is read_feed], options["duration"]),
+            "writes": summarize([result for send, result in results
+                                 if send is create_ticket],
+                                options["duration"]),
+        }
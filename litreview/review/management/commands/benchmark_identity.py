@@ -0,0 +1,115 @@
+import json
+import statistics
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, \
+    setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from authentication.models import User
+from review.dataset import DatasetGenerator
+from .benchmark import git_commit
+
+PROFILES = {
+    "database": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+        "AUTHENTICATION_BACKENDS": [
+            "django.contrib.auth.backends.ModelBackend",
+        ],
+    },
+    "cached": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.cached_db",
+        "AUTHENTICATION_BACKENDS": [
+            "authentication.backends.CachedModelBackend",
+        ],
+    },
+}
+
+
+class Command(BaseCommand):
+    help = "Measures the queries and latency of the review views with the " \
+           "session and user read from the database, then from the cache, " \
+           "in a throwaway test database. Prints JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--follows", type=int, default=20)
+        parser.add_argument("--tickets", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=50,
+                            help="Measured requests for each view.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output",
+                            help="File to write the JSON to.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                           serialize=False)
+        try:
+            DatasetGenerator(users=options["users"],
+                             follows=options["follows"],
+                             tickets=options["tickets"],
+                             image_ratio=0,
+                             seed=options["seed"]).generate()
+            user = User.objects.order_by("id").first()
+            profiles = {}
+            for name, profile in PROFILES.items():
+                with override_settings(**profile):
+                    profiles[name] = self.run_profile(user, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        saved = {
+            view: profiles["database"][view]["queries"]
+            - profiles["cached"][view]["queries"]
+            for view in profiles["database"]
+        }
+        report = json.dumps({
+            "commit": git_commit(),
+            "users": options["users"],
+            "repeat": options["repeat"],
+            "profiles": profiles,
+            "saved_queries": saved,
+        }, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(report + "\n")
+        else:
+            self.stdout.write(report)
+
+    def run_profile(self, user, options):
+        # a new client loads the middleware, and the session engine, again
+        cache.clear()
+        client = Client()
+        client.force_login(user)
+        return {
+            name: self.measure(client, url, options)
+            for name, url in (("feed", reverse("feed")),
+                              ("posts", reverse("posts")),
+                              ("follows", reverse("follows")))
+        }
+
+    def measure(self, client, url, options):
+        # the first request fills the caches, the next ones are the
+        # steady state of a logged in user
+        client.get(url)
+        durations = []
+        for _ in range(options["repeat"]):
+            with CaptureQueriesContext(connection) as queries:
+                start = perf_counter()
+                response = client.get(url)
+                durations.append((perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{response.status_code} response.")
+        return {
+            "median_ms": round(statistics.median(durations), 3),
+            "p95_ms": round(statistics.quantiles(durations, n=20)[-1], 3)
+            if len(durations) > 1 else round(durations[0], 3),
+            "queries": len(queries),
+        }
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from authentication.models import User
+from review.feed import PostStream, InboxStream, PostPaginator, \
+    CursorPaginator, encode_cursor
+from review.models import UserFollows, FeedEntry
+from review.views import get_viewable_tickets, get_viewable_reviews, \
+    get_own_posts, ticket_posts, review_posts
+
+
+class Command(BaseCommand):
+    help = "Prints the query plan of each query run to show the feed of a " \
+           "user (count, keys and posts of a page), to check that the " \
+           "indexes are used."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist.")
+
+        stream = PostStream(get_viewable_tickets(user),
+                            get_viewable_reviews(user))
+        inbox = InboxStream(FeedEntry.objects.filter(user=user.id),
+                            ticket_posts(), review_posts())
+        own_posts = PostStream(*get_own_posts(user))
+        first_keys = list(stream.keys()[:1])
+
+        # run as the views do, the plan of every query they make is printed
+        runs = {
+            "follows": lambda: list(
+                UserFollows.objects.followed_query(user.id)
+            ),
+            "followers": lambda: list(
+                UserFollows.objects.followers_query(user.id)
+            ),
+            "feed page": lambda: PostPaginator(stream).get_page(1),
+            "feed page after a cursor": lambda: CursorPaginator(
+                stream
+            ).get_page(after=encode_cursor(first_keys[0]))
+            if first_keys else None,
+            "feed inbox page": lambda: PostPaginator(inbox).get_page(1),
+            "own posts page": lambda: PostPaginator(own_posts).get_page(1),
+        }
+        for name, run in runs.items():
+            with CaptureQueriesContext(connection) as queries:
+                run()
+            for number, query in enumerate(queries, start=1):
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"{name} ({number}/{len(queries)})"
+                ))
+                self.stdout.write(query["sql"])
+                self.stdout.write(self.explain(query["sql"]))
+                self.stdout.write("")
+
+    def explain(self, sql):
+        # the captured statements hold their parameters, quoted
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}")
+            return "\n".join(" ".join(str(column) for column in row)
+                             for row in cursor.fetchall())
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import User
+from review.follows import format_usernames
+from review.models import UserFollows
+
+
+class Command(BaseCommand):
+    help = "Writes the usernames followed by a user, one per line."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--output",
+                            help="File to write the usernames to.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Aucun utilisateur {options['username']}.")
+        usernames = UserFollows.objects.followed_usernames(user)
+        content = format_usernames(usernames)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(content)
+        else:
+            self.stdout.write(content, ending="")
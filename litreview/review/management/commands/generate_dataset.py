@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from review.dataset import DatasetGenerator, PASSWORD
+
+
+class Command(BaseCommand):
+    help = "Generates a reproducible synthetic social graph of users, " \
+           "follows, tickets, reviews and images."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--follows", type=int, default=20,
+                            help="Number of users followed by each user.")
+        parser.add_argument("--distribution", choices=("zipf", "uniform"),
+                            default="zipf",
+                            help="How the followed users are drawn.")
+        parser.add_argument("--zipf-exponent", type=float, default=1.1)
+        parser.add_argument("--tickets", type=int, default=10,
+                            help="Number of tickets of each user.")
+        parser.add_argument("--review-ratio", type=float, default=0.6,
+                            help="Share of the tickets having a review.")
+        parser.add_argument("--image-ratio", type=float, default=0.1,
+                            help="Share of the tickets having an image.")
+        parser.add_argument("--days", type=int, default=365,
+                            help="Period over which the posts are spread.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="user",
+                            help="Prefix of the generated usernames.")
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(
+            users=options["users"],
+            follows=options["follows"],
+            distribution=options["distribution"],
+            zipf_exponent=options["zipf_exponent"],
+            tickets=options["tickets"],
+            review_ratio=options["review_ratio"],
+            image_ratio=options["image_ratio"],
+            days=options["days"],
+            seed=options["seed"],
+            prefix=options["prefix"],
+        )
+        user_ids = generator.generate()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(user_ids)} utilisateurs créés "
+            f"(mot de passe : {PASSWORD})."
+        ))
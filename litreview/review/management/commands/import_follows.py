@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import User
+from review.follows import STATUS_LABELS, MAX_IMPORTED_FOLLOWS, \
+    parse_usernames
+from review.models import UserFollows
+
+
+class Command(BaseCommand):
+    help = "Makes a user follow every username of a file, one per line " \
+           "as written by export_follows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User following the names.")
+        parser.add_argument("file", help="File of usernames.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Aucun utilisateur {options['username']}.")
+        with open(options["file"], encoding="utf-8-sig") as file:
+            usernames = parse_usernames(file.read())
+        if len(usernames) > MAX_IMPORTED_FOLLOWS:
+            raise CommandError(f"Le fichier ne doit pas dépasser "
+                               f"{MAX_IMPORTED_FOLLOWS} noms d'utilisateur.")
+
+        for username, status in UserFollows.objects.import_follows(
+                user, usernames):
+            self.stdout.write(f"{username} : {STATUS_LABELS[status]}")
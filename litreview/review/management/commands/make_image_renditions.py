@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from review.images import make_renditions
+from review.models import Ticket
+
+
+class Command(BaseCommand):
+    help = "Makes the downscaled copies of the ticket images " \
+           "which don't have them yet."
+
+    def handle(self, *args, **options):
+        tickets = Ticket.objects.exclude(image="").exclude(image=None) \
+            .filter(image_widths="").values_list("id", "image")
+        for ticket_id, name in tickets.iterator():
+            make_renditions(ticket_id, name)
+            self.stdout.write(name)
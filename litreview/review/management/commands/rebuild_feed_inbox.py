@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from authentication.models import User
+from review.models import FeedEntry
+from review.views import get_viewable_tickets, get_viewable_reviews
+
+
+class Command(BaseCommand):
+    help = "Recomputes the precomputed feed inbox of every user."
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*",
+                            help="Only rebuild the inbox of these users.")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+
+        for user in users.iterator():
+            FeedEntry.objects.rebuild(user,
+                                      get_viewable_tickets(user),
+                                      get_viewable_reviews(user))
+        self.stdout.write(self.style.SUCCESS(
+            f"{FeedEntry.objects.count()} entrées de flux reconstruites."
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from review.search import SEARCH_TABLE, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Recomputes the full-text search index of the tickets and " \
+           "reviews."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_search_index()
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")
+            count = cursor.fetchone()[0]
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} posts indexés pour la recherche."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from review.models import Ticket
+
+
+class Command(BaseCommand):
+    help = "Recomputes the review count and the rating sum of every " \
+           "ticket from its reviews."
+
+    def handle(self, *args, **options):
+        wrong = Ticket.objects.with_wrong_review_stats().count()
+        updated = Ticket.objects.refresh_review_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"{updated} tickets recalculés, dont {wrong} qui étaient faux."
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from review.sweeper import sweep_deleted_tickets, collect_media_garbage
+
+
+class Command(BaseCommand):
+    help = "Deletes the tickets marked as deleted which are still waiting " \
+           "for the sweeper, then removes the media files no ticket " \
+           "refers to."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int,
+                            help="Tickets deleted per transaction.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report the files which would be "
+                                 "removed.")
+
+    def handle(self, *args, **options):
+        if not options["dry_run"]:
+            tickets, reclaimed = sweep_deleted_tickets(options["batch_size"])
+            self.stdout.write(
+                f"{tickets} tickets supprimés, {reclaimed} octets libérés."
+            )
+
+        files, reclaimed = collect_media_garbage(options["dry_run"])
+        verb = "à supprimer" if options["dry_run"] else "supprimés"
+        self.stdout.write(self.style.SUCCESS(
+            f"{files} fichiers orphelins {verb}, {reclaimed} octets libérés."
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0004_post_time_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='image_widths',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.1.7 on 2026-10-18 12:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_review_stats(apps, schema_editor):
+    Ticket = apps.get_model('review', 'Ticket')
+    Review = apps.get_model('review', 'Review')
+    reviews = Review.objects.filter(
+        ticket=OuterRef('pk')
+    ).order_by().values('ticket')
+    Ticket.objects.update(
+        review_count=Coalesce(Subquery(
+            reviews.annotate(count=Count('id')).values('count')
+        ), 0),
+        rating_sum=Coalesce(Subquery(
+            reviews.annotate(sum=Sum('rating')).values('sum')
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0005_ticket_image_widths'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_review_stats, migrations.RunPython.noop),
+    ]
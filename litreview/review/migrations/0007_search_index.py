@@ -0,0 +1,26 @@
+# Generated by Django 4.1.7 on 2026-10-18 14:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0006_ticket_review_stats'),
+    ]
+
+    operations = [
+        # full-text index of the tickets (title, description) and the
+        # reviews (headline, body), see review.search
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE review_search USING fts5("
+                "title, body, tokenize='unicode61 remove_diacritics 2')",
+                "INSERT INTO review_search (rowid, title, body) "
+                "SELECT id * 2, title, description FROM review_ticket",
+                "INSERT INTO review_search (rowid, title, body) "
+                "SELECT id * 2 + 1, headline, body FROM review_review",
+            ],
+            reverse_sql="DROP TABLE review_search",
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='time_deleted',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.7 on 2026-10-18 09:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0008_ticket_time_deleted'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_user_time_idx',
+        ),
+        migrations.AlterField(
+            model_name='ticket',
+            name='time_deleted',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('time_deleted__isnull', True)), fields=['user', '-time_created'], name='ticket_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('time_deleted__isnull', False)), fields=['time_deleted'], name='ticket_deleted_idx'),
+        ),
+    ]
@@ -1,25 +1,132 @@
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
-from django.db import models, IntegrityError
+from django.db import models, transaction, IntegrityError
+from django.db.models import Q, F, OuterRef, Subquery, Count, Sum
+from django.db.models.functions import Coalesce, Greatest
 from django.core.exceptions import ObjectDoesNotExist, FieldError, BadRequest
 
+from django.core.cache import cache
+from django.utils import timezone
+
 from authentication.models import User
+from .cache import invalidate_feeds, invalidate_follow_graph, \
+    followed_key, followers_key, aget_or_set
+from .feed import TICKET, REVIEW
+from .follows import FOLLOWED, ALREADY_FOLLOWED, UNKNOWN_USER, OWN_USERNAME
+from .events import publish_new_post
+from .images import schedule_renditions
+from .sweeper import schedule_sweep
+from .search import unindex_posts
 
 
 class TicketManager(models.Manager):
+    def get_queryset(self):
+        # the tickets marked as deleted wait for the sweeper, see
+        # Ticket.all_objects
+        return super().get_queryset().filter(time_deleted__isnull=True)
+
     def create(self, user, form):
         ticket = form.save(commit=False)
         ticket.user = user
-        ticket.save()
+        with transaction.atomic():
+            ticket.save()
+            if settings.FEED_INBOX:
+                FeedEntry.objects.fan_out_ticket(ticket)
+            if ticket.image:
+                schedule_renditions(ticket)
+            transaction.on_commit(lambda: publish_new_post(
+                TICKET, ticket.id,
+                [ticket.user_id,
+                 *UserFollows.objects.follower_ids(ticket.user_id)],
+            ))
         return ticket
 
     def update(self, ticket, form):
         ticket.title = form.cleaned_data["title"]
         ticket.description = form.cleaned_data["description"]
         ticket.image = form.cleaned_data["image"]
-        ticket.save()
+        if "image" in form.changed_data:
+            ticket.image_widths = ""
+        with transaction.atomic():
+            ticket.save()
+            if ticket.image and "image" in form.changed_data:
+                schedule_renditions(ticket)
         return ticket
 
+    def invalidate_viewers(self, ticket_id, posters=()):
+        # everyone who sees the ticket, alone or in a review: its owner,
+        # its reviewers and their followers. posters adds the authors of
+        # rows already deleted.
+        posters = {
+            *posters,
+            *Ticket.all_objects.filter(id=ticket_id).values_list("user",
+                                                                 flat=True),
+            *Review.objects.filter(ticket=ticket_id).values_list("user",
+                                                                 flat=True),
+        }
+        invalidate_feeds([*posters, *(
+            follower for poster in posters
+            for follower in UserFollows.objects.follower_ids(poster)
+        )])
+
+    def mark_deleted(self, ticket):
+        # hidden at once, the rows of the ticket and its reviews and the
+        # image are deleted by the sweeper
+        with transaction.atomic():
+            self.filter(id=ticket.id).update(time_deleted=timezone.now())
+            # read after the update, a review created meanwhile is hidden too
+            reviews = list(Review.objects.filter(
+                ticket=ticket.id
+            ).values_list("id", "user_id"))
+            if settings.FEED_INBOX:
+                FeedEntry.objects.remove_posts(TICKET, [ticket.id])
+                FeedEntry.objects.remove_posts(
+                    REVIEW, [review_id for review_id, _ in reviews]
+                )
+            self.invalidate_viewers(
+                ticket.id, [user_id for _, user_id in reviews]
+            )
+            schedule_sweep()
+
+    def delete_swept(self, ticket_ids):
+        # deletes tickets marked as deleted and their reviews in a few
+        # queries whatever their number, without the post_delete signals of
+        # each row: their effects are applied to the whole set here, and the
+        # viewers were invalidated when the tickets were marked
+        reviews = Review.objects.filter(ticket__in=ticket_ids)
+        review_ids = list(reviews.values_list("id", flat=True))
+        if settings.FEED_INBOX:
+            FeedEntry.objects.remove_posts(TICKET, ticket_ids)
+            FeedEntry.objects.remove_posts(REVIEW, review_ids)
+        unindex_posts(TICKET, ticket_ids)
+        unindex_posts(REVIEW, review_ids)
+        reviews._raw_delete(self.db)
+        Ticket.all_objects.filter(id__in=ticket_ids)._raw_delete(self.db)
+
+    def refresh_review_stats(self, tickets=None):
+        # recomputes the counters of the tickets in a single UPDATE
+        reviews = Review.objects.filter(
+            ticket=OuterRef("pk")
+        ).order_by().values("ticket")
+        queryset = self.all() if tickets is None else self.filter(
+            id__in=tickets
+        )
+        return queryset.update(
+            review_count=Coalesce(Subquery(
+                reviews.annotate(count=Count("id")).values("count")
+            ), 0),
+            rating_sum=Coalesce(Subquery(
+                reviews.annotate(sum=Sum("rating")).values("sum")
+            ), 0),
+        )
+
+    def with_wrong_review_stats(self):
+        return self.annotate(
+            actual_count=Count("review"),
+            actual_sum=Coalesce(Sum("review__rating"), 0),
+        ).exclude(review_count=F("actual_count"),
+                  rating_sum=F("actual_sum"))
+
 
 class Ticket(models.Model):
     title = models.CharField(max_length=128)
@@ -29,9 +136,42 @@ class Ticket(models.Model):
         on_delete=models.CASCADE
     )
     image = models.ImageField(null=True, blank=True)
+    # widths of the downscaled copies of the image, filled in the background
+    image_widths = models.CharField(max_length=32, blank=True, default="")
     time_created = models.DateTimeField(auto_now_add=True)
+    time_updated = models.DateTimeField(auto_now=True)
+    # kept up to date by ReviewManager and the post_delete signal of the
+    # reviews, recomputed by "python manage.py repair_review_stats"
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    # set by TicketManager.mark_deleted, the sweeper deletes the row
+    time_deleted = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # live posts of the followed users, newest first
+            models.Index(fields=["user", "-time_created"],
+                         condition=Q(time_deleted__isnull=True),
+                         name="ticket_user_time_idx"),
+            # the few tickets waiting for the sweeper only, a full index
+            # would be preferred to the one above by the feed queries
+            models.Index(fields=["time_deleted"],
+                         condition=Q(time_deleted__isnull=False),
+                         name="ticket_deleted_idx"),
+        ]
 
     objects = TicketManager()
+    all_objects = models.Manager()
+
+    @property
+    def rendition_widths(self):
+        return [int(width) for width in self.image_widths.split(",") if width]
+
+    @property
+    def avg_rating(self):
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
 
 
 class ReviewManager(models.Manager):
@@ -39,16 +179,41 @@ class ReviewManager(models.Manager):
         review = form.save(commit=False)
         review.user = user
         review.ticket = ticket
-        review.save()
+        with transaction.atomic():
+            review.save()
+            Ticket.objects.filter(id=ticket.id).update(
+                review_count=F("review_count") + 1,
+                rating_sum=F("rating_sum") + review.rating,
+            )
+            if settings.FEED_INBOX:
+                FeedEntry.objects.fan_out_review(review)
+            transaction.on_commit(lambda: publish_new_post(
+                REVIEW, review.id,
+                [review.user_id, ticket.user_id,
+                 *UserFollows.objects.follower_ids(review.user_id)],
+            ))
         return review
 
     def update(self, review, form):
+        rating_change = form.cleaned_data["rating"] - review.rating
         review.rating = form.cleaned_data["rating"]
         review.headline = form.cleaned_data["headline"]
         review.body = form.cleaned_data["body"]
-        review.save()
+        with transaction.atomic():
+            review.save()
+            if rating_change:
+                Ticket.objects.filter(id=review.ticket_id).update(
+                    rating_sum=F("rating_sum") + rating_change
+                )
         return review
 
+    def remove_from_ticket_stats(self, review):
+        # never below 0, a counter gone wrong must not prevent a deletion
+        Ticket.objects.filter(id=review.ticket_id).update(
+            review_count=Greatest(F("review_count") - 1, 0),
+            rating_sum=Greatest(F("rating_sum") - review.rating, 0),
+        )
+
 
 class Review(models.Model):
     ticket = models.ForeignKey(to=Ticket, on_delete=models.CASCADE)
@@ -60,6 +225,16 @@ class Review(models.Model):
     user = models.ForeignKey(
         to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     time_created = models.DateTimeField(auto_now_add=True)
+    time_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-time_created"],
+                         name="review_user_time_idx"),
+            # reviews on the tickets of a user, newest first
+            models.Index(fields=["ticket", "-time_created"],
+                         name="review_ticket_time_idx"),
+        ]
 
     objects = ReviewManager()
 
@@ -75,13 +250,108 @@ class UserFollowsManager(models.Manager):
             try:
                 followed_user = User.objects.get(username=followed_name)
                 follow.followed_user = followed_user
-                follow.save()
+                with transaction.atomic():
+                    follow.save()
+                    if settings.FEED_INBOX:
+                        FeedEntry.objects.backfill_follow(follow)
             except User.DoesNotExist:
                 return ObjectDoesNotExist
             except IntegrityError:
                 return BadRequest
             return follow
 
+    def import_follows(self, user, usernames):
+        # a constant number of queries whatever the number of names,
+        # returns the status of each name
+        usernames = list(dict.fromkeys(usernames))
+        followed_ids = dict(User.objects.filter(
+            username__in=usernames
+        ).values_list("username", "id"))
+        with transaction.atomic():
+            already_followed = set(self.filter(
+                user=user, followed_user__in=followed_ids.values()
+            ).values_list("followed_user", flat=True))
+
+            results = []
+            new_follows = []
+            for username in usernames:
+                followed_id = followed_ids.get(username)
+                if username == user.username:
+                    status = OWN_USERNAME
+                elif followed_id is None:
+                    status = UNKNOWN_USER
+                elif followed_id in already_followed:
+                    status = ALREADY_FOLLOWED
+                else:
+                    status = FOLLOWED
+                    new_follows.append(followed_id)
+                results.append((username, status))
+
+            # bulk_create sends no post_save, the follower's feed is
+            # invalidated here
+            self.bulk_create(
+                [UserFollows(user=user, followed_user_id=followed_id)
+                 for followed_id in new_follows],
+                batch_size=500,
+                ignore_conflicts=True,
+            )
+            if settings.FEED_INBOX and new_follows:
+                FeedEntry.objects.backfill_follows(user.id, new_follows)
+        invalidate_follow_graph(user.id, new_follows)
+        invalidate_feeds([user.id])
+        return results
+
+    def followed_usernames(self, user):
+        return [follow["username"] for follow in self.followed(user.id)]
+
+    # The follows of a user in both directions are cached until one of them
+    # is saved or deleted, as dicts of the follow id, the other user's id
+    # and their username.
+
+    def followed_query(self, user_id):
+        return self.filter(user=user_id).order_by(
+            "followed_user__username"
+        ).values("id", followed_id=F("followed_user"),
+                 username=F("followed_user__username"))
+
+    def followers_query(self, user_id):
+        return self.filter(followed_user=user_id).order_by(
+            "user__username"
+        ).values("id", follower_id=F("user"),
+                 username=F("user__username"))
+
+    def followed(self, user_id):
+        return cache.get_or_set(followed_key(user_id),
+                                lambda: list(self.followed_query(user_id)),
+                                settings.FOLLOW_GRAPH_CACHE_TIMEOUT)
+
+    def followers(self, user_id):
+        return cache.get_or_set(followers_key(user_id),
+                                lambda: list(self.followers_query(user_id)),
+                                settings.FOLLOW_GRAPH_CACHE_TIMEOUT)
+
+    def followed_ids(self, user_id):
+        return [follow["followed_id"] for follow in self.followed(user_id)]
+
+    def follower_ids(self, user_id):
+        return [follow["follower_id"] for follow in self.followers(user_id)]
+
+    async def afollowed(self, user_id):
+        async def query():
+            return [follow async for follow in self.followed_query(user_id)]
+        return await aget_or_set(followed_key(user_id), query,
+                                 settings.FOLLOW_GRAPH_CACHE_TIMEOUT)
+
+    async def afollowers(self, user_id):
+        async def query():
+            return [follow async for follow in self.followers_query(user_id)]
+        return await aget_or_set(followers_key(user_id), query,
+                                 settings.FOLLOW_GRAPH_CACHE_TIMEOUT)
+
+    async def afollowed_ids(self, user_id):
+        return [follow["followed_id"]
+                for follow in await self.afollowed(user_id)]
+
 
 class UserFollows(models.Model):
     user = models.ForeignKey(
@@ -99,5 +369,106 @@ class UserFollows(models.Model):
         # ensures we don't get multiple UserFollows instances
         # for unique user-user_followed pairs
         unique_together = ('user', 'followed_user', )
+        indexes = [
+            # followers of a user, read without touching the table
+            models.Index(fields=["followed_user", "user"],
+                         name="follows_followed_user_idx"),
+        ]
 
     objects = UserFollowsManager()
+
+
+class FeedEntryManager(models.Manager):
+    def fan_out(self, post_type, post, recipients):
+        self.bulk_create(
+            [FeedEntry(user_id=user_id,
+                       post_type=post_type,
+                       post_id=post.id,
+                       time_created=post.time_created)
+             for user_id in set(recipients)],
+            ignore_conflicts=True,
+        )
+
+    def fan_out_ticket(self, ticket):
+        followers = UserFollows.objects.follower_ids(ticket.user_id)
+        self.fan_out(TICKET, ticket, [ticket.user_id, *followers])
+
+    def fan_out_review(self, review):
+        # the owner of the reviewed ticket sees the review
+        # even if they don't follow its author
+        followers = UserFollows.objects.follower_ids(review.user_id)
+        self.fan_out(REVIEW, review,
+                     [review.user_id, review.ticket.user_id, *followers])
+
+    def add_posts(self, user_id, post_type, posts):
+        self.bulk_create(
+            (FeedEntry(user_id=user_id,
+                       post_type=post_type,
+                       post_id=post_id,
+                       time_created=time_created)
+             for post_id, time_created
+             in posts.values_list("id", "time_created").iterator()),
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+    def backfill_follow(self, follow):
+        self.backfill_follows(follow.user_id, [follow.followed_user_id])
+
+    def backfill_follows(self, user_id, followed_users):
+        self.add_posts(user_id, TICKET,
+                       Ticket.objects.filter(user__in=followed_users))
+        self.add_posts(user_id, REVIEW, Review.objects.filter(
+            user__in=followed_users, ticket__time_deleted__isnull=True
+        ))
+
+    def prune_follow(self, follow):
+        # reviews of the unfollowed user on the user's own tickets stay
+        followed_user = follow.followed_user_id
+        tickets = Ticket.objects.filter(user=followed_user)
+        reviews = Review.objects.filter(user=followed_user).exclude(
+            ticket__user=follow.user_id
+        )
+        self.filter(user=follow.user_id).filter(
+            Q(post_type=TICKET, post_id__in=tickets.values("id")) |
+            Q(post_type=REVIEW, post_id__in=reviews.values("id"))
+        ).delete()
+
+    def remove_post(self, post_type, post):
+        self.remove_posts(post_type, [post.id])
+
+    def remove_posts(self, post_type, post_ids):
+        self.filter(post_type=post_type, post_id__in=post_ids).delete()
+
+    def rebuild(self, user, tickets, reviews):
+        with transaction.atomic():
+            self.filter(user=user).delete()
+            self.add_posts(user.id, TICKET, tickets)
+            self.add_posts(user.id, REVIEW, reviews)
+
+
+class FeedEntry(models.Model):
+    """
+    A post visible in the feed of a user, written when the post is created
+    or a follow is added, so the feed is read without computing visibility.
+    """
+    user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="feed_entries"
+    )
+    post_type = models.CharField(max_length=6)
+    post_id = models.PositiveBigIntegerField()
+    time_created = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post_type', 'post_id', )
+        indexes = [
+            # matches the ordering of the feed
+            models.Index(
+                fields=["user", "-time_created", "-post_type", "-post_id"],
+                name="feed_entry_user_time_idx",
+            ),
+        ]
+
+    objects = FeedEntryManager()
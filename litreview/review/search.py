@@ -0,0 +1,122 @@
+import re
+
+from django.db import connection
+
+from .feed import TICKET, REVIEW, PostStream
+
+SEARCH_TABLE = "review_search"
+
+
+def search_rowid(post_type, post_id):
+    # tickets and reviews share the table, the parity of the rowid gives
+    # the type of the post so that a post is updated through its rowid
+    return post_id * 2 + (post_type == REVIEW)
+
+
+def post_key(rowid):
+    return {"post_type": REVIEW if rowid % 2 else TICKET,
+            "post_id": rowid // 2}
+
+
+def index_post(post_type, post_id, title, body):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, title, body) "
+            f"VALUES (%s, %s, %s)",
+            [search_rowid(post_type, post_id), title, body],
+        )
+
+
+def unindex_post(post_type, post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+                       [search_rowid(post_type, post_id)])
+
+
+def unindex_posts(post_type, post_ids):
+    if not post_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})",
+            [search_rowid(post_type, post_id) for post_id in post_ids],
+        )
+
+
+def rebuild_search_index():
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) "
+            f"SELECT id * 2, title, description FROM review_ticket"
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) "
+            f"SELECT id * 2 + 1, headline, body FROM review_review"
+        )
+
+
+def match_expression(query):
+    # the words of the query are quoted, the FTS5 syntax of a user's input
+    # would fail on a lone quote or an operator, and matched as prefixes
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+class SearchKeys:
+    """
+    Keys of the posts matching a search among the given tickets and
+    reviews, best ranked (bm25) first, counted and sliced in SQL like a
+    queryset for PostPaginator.
+    """
+    ordered = True
+
+    def __init__(self, match, tickets, reviews):
+        tickets_sql, tickets_params = \
+            tickets.order_by().values("id").query.sql_with_params()
+        reviews_sql, reviews_params = \
+            reviews.order_by().values("id").query.sql_with_params()
+        self.where = (
+            f"{SEARCH_TABLE} MATCH %s AND ("
+            f"rowid %% 2 = 0 AND rowid / 2 IN ({tickets_sql}) OR "
+            f"rowid %% 2 = 1 AND rowid / 2 IN ({reviews_sql}))"
+        )
+        self.params = [match, *tickets_params, *reviews_params]
+        self.match = match
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {self.where}",
+                self.params,
+            )
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, index):
+        start = index.start or 0
+        if not self.match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {SEARCH_TABLE} WHERE {self.where} "
+                f"ORDER BY bm25({SEARCH_TABLE}), rowid DESC "
+                f"LIMIT %s OFFSET %s",
+                [*self.params, index.stop - start, start],
+            )
+            return [post_key(rowid) for rowid, in cursor.fetchall()]
+
+
+class SearchStream(PostStream):
+    """
+    Posts matching a search, restricted to the given tickets and reviews.
+    Paginated by PostPaginator only, the ranking has no cursor.
+    """
+
+    def __init__(self, query, tickets, reviews):
+        super().__init__(tickets, reviews)
+        self.match = match_expression(query)
+
+    def keys(self, cursor=None, older=True):
+        return SearchKeys(self.match, self.tickets, self.reviews)
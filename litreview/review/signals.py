@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_feeds, invalidate_follow_graph
+from .feed import TICKET, REVIEW
+from .models import Ticket, Review, UserFollows, FeedEntry
+from .search import index_post, unindex_post
+
+
+@receiver(post_delete, sender=Ticket)
+def remove_ticket_feed_entries(sender, instance, **kwargs):
+    if settings.FEED_INBOX:
+        FeedEntry.objects.remove_post(TICKET, instance)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_feed_entries(sender, instance, **kwargs):
+    # also sent for the reviews deleted in cascade with their ticket
+    if settings.FEED_INBOX:
+        FeedEntry.objects.remove_post(REVIEW, instance)
+
+
+@receiver(post_save, sender=Ticket)
+def index_ticket(sender, instance, **kwargs):
+    index_post(TICKET, instance.id, instance.title, instance.description)
+
+
+@receiver(post_save, sender=Review)
+def index_review(sender, instance, **kwargs):
+    index_post(REVIEW, instance.id, instance.headline, instance.body)
+
+
+@receiver(post_delete, sender=Ticket)
+def unindex_ticket(sender, instance, **kwargs):
+    unindex_post(TICKET, instance.id)
+
+
+@receiver(post_delete, sender=Review)
+def unindex_review(sender, instance, **kwargs):
+    unindex_post(REVIEW, instance.id)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_ticket_stats(sender, instance, **kwargs):
+    Review.objects.remove_from_ticket_stats(instance)
+
+
+# a ticket is shown in the reviews answering it too, and the reviews
+# change the button answering it, the pages of all of its viewers change
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidate_ticket_feeds(sender, instance, **kwargs):
+    Ticket.objects.invalidate_viewers(instance.id, [instance.user_id])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_feeds(sender, instance, **kwargs):
+    Ticket.objects.invalidate_viewers(instance.ticket_id, [instance.user_id])
+
+
+@receiver(post_save, sender=UserFollows)
+@receiver(post_delete, sender=UserFollows)
+def invalidate_follows(sender, instance, **kwargs):
+    invalidate_follow_graph(instance.user_id, [instance.followed_user_id])
+    invalidate_feeds([instance.user_id])
@@ -0,0 +1,114 @@
+import logging
+from datetime import timedelta
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .images import RENDITION_WIDTHS, RENDITION_FORMATS, rendition_name
+from .workers import schedule
+
+logger = logging.getLogger(__name__)
+
+
+def media_files(name):
+    # an uploaded image and the downscaled copies it may have
+    return [name, *(rendition_name(name, width, extension)
+                    for width in RENDITION_WIDTHS
+                    for _, extension in RENDITION_FORMATS)]
+
+
+def remove_file(name):
+    size = default_storage.size(name)
+    default_storage.delete(name)
+    return size
+
+
+def sweep_deleted_tickets(batch_size=None):
+    """
+    Deletes the tickets marked as deleted, with their reviews, a batch per
+    transaction, then the files no remaining ticket uses. Returns the
+    number of tickets and the bytes reclaimed.
+    """
+    from .models import Ticket
+
+    batch_size = batch_size or settings.DELETE_SWEEP_BATCH_SIZE
+    tickets = reclaimed = 0
+    while True:
+        with transaction.atomic():
+            batch = list(Ticket.all_objects.filter(
+                time_deleted__isnull=False
+            ).order_by("id").values_list("id", "image")[:batch_size])
+            if not batch:
+                break
+            Ticket.objects.delete_swept([ticket_id for ticket_id, _ in batch])
+        tickets += len(batch)
+
+        # the images of the dataset generator are shared by several tickets
+        images = {image for _, image in batch if image}
+        images -= set(Ticket.all_objects.filter(
+            image__in=images
+        ).values_list("image", flat=True))
+        for image in images:
+            for name in media_files(image):
+                if default_storage.exists(name):
+                    reclaimed += remove_file(name)
+    return tickets, reclaimed
+
+
+def sweep():
+    tickets, reclaimed = sweep_deleted_tickets()
+    if tickets:
+        logger.info("%s deleted tickets swept, %s bytes reclaimed.",
+                    tickets, reclaimed)
+
+
+def schedule_sweep():
+    # a single thread, two sweeps would delete the same batches
+    schedule("sweeper", 1 if settings.DELETE_SWEEP_IN_BACKGROUND else 0,
+             sweep)
+
+
+def media_names(directory=""):
+    directories, files = default_storage.listdir(directory)
+    for name in files:
+        yield str(PurePosixPath(directory) / name)
+    for name in directories:
+        yield from media_names(str(PurePosixPath(directory) / name))
+
+
+def collect_media_garbage(dry_run=False):
+    """
+    Mark and sweep of MEDIA_ROOT: the files of every ticket, deleted or
+    not, are marked, the others are removed. The directories of
+    MEDIA_GC_KEEP and the files younger than MEDIA_GC_GRACE_PERIOD, which
+    may belong to a ticket not committed yet, are kept. Returns the
+    number of files and the bytes reclaimed.
+    """
+    from .models import Ticket
+
+    referenced = set()
+    for image in Ticket.all_objects.exclude(image="").exclude(
+        image__isnull=True
+    ).values_list("image", flat=True).iterator():
+        referenced.update(media_files(image))
+
+    if not default_storage.exists(""):
+        return 0, 0
+    kept = tuple(settings.MEDIA_GC_KEEP)
+    limit = timezone.now() - timedelta(
+        seconds=settings.MEDIA_GC_GRACE_PERIOD
+    )
+    files = reclaimed = 0
+    for name in media_names():
+        if name in referenced or name.startswith(kept) \
+                or default_storage.get_modified_time(name) > limit:
+            continue
+        files += 1
+        if dry_run:
+            reclaimed += default_storage.size(name)
+        else:
+            reclaimed += remove_file(name)
+    return files, reclaimed
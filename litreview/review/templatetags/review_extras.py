@@ -1,10 +1,14 @@
+from functools import lru_cache
+
 from django import template
-import locale
-locale.setlocale(locale.LC_TIME, '')
 
+from review.images import get_srcset
 
 register = template.Library()
 
+MONTHS = ("janvier", "février", "mars", "avril", "mai", "juin", "juillet",
+          "août", "septembre", "octobre", "novembre", "décembre")
+
 
 @register.filter
 def model_type(value):
@@ -25,10 +29,17 @@ def get_verb_display(context, user):
     return "a"
 
 
+@lru_cache(maxsize=4096)
+def format_minute(year, month, day, hour, minute):
+    # the posts of a page share few distinct minutes
+    return f"{hour:02d}:{minute:02d}, {day:02d} {MONTHS[month - 1]} {year}"
+
+
 @register.simple_tag(takes_context=True)
 def get_posted_at_display(context, date_created):
-    date = date_created.strftime('%H:%M, %d %B %Y')
-    return f"{date}"
+    return format_minute(date_created.year, date_created.month,
+                         date_created.day, date_created.hour,
+                         date_created.minute)
 
 
 @register.simple_tag(takes_context=True)
@@ -40,3 +51,8 @@ def get_review_stars_display(context, rating):
     white_star_number = (5 - rating) * white_star
 
     return f"{black_stars_number}{white_star_number}"
+
+
+@register.simple_tag(takes_context=True)
+def get_image_srcset(context, ticket, extension):
+    return get_srcset(ticket, extension)
@@ -1,3 +1,1282 @@
-# from django.test import TestCase
+import asyncio
+import os
+from datetime import datetime, timedelta
+import gzip
+from io import BytesIO, StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
-# Create your tests here.
+from PIL import Image
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import Http404, HttpResponse
+from django.test import TestCase, RequestFactory, override_settings, \
+    AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from authentication.models import User
+from litreview.instrumentation import InstrumentationMiddleware
+from litreview.serving import serve, serve_static
+from .models import Ticket, Review, UserFollows, FeedEntry
+from .forms import TicketForm, ReviewForm, FollowForm
+from .views import Feed, get_viewable_tickets, get_viewable_reviews, \
+    get_feed_stream
+from .feed import PostStream, PostPaginator, CursorPaginator
+from .images import rendition_name
+from .dataset import DatasetGenerator
+from .templatetags.review_extras import get_posted_at_display
+from .events import FeedEventsMiddleware, get_broker
+from .search import SearchStream
+from .follows import MAX_IMPORT_FILE_SIZE
+from .workers import schedule, get_executor
+from .sweeper import sweep_deleted_tickets
+from .uploads import SizeLimitedUploadHandler
+
+
+class ReviewTestCase(TestCase):
+    password = "Hello1234!"
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user("toto")
+        self.followed = self.create_user("titi")
+        self.stranger = self.create_user("tata")
+        UserFollows.objects.bulk_create(
+            [UserFollows(user=self.user, followed_user=self.followed)]
+        )
+        self.start = datetime(2023, 5, 1, 12, 0)
+        self.minutes = 0
+
+    def create_user(self, username):
+        user = User(username=username)
+        user.set_password(self.password)
+        user.save()
+        return user
+
+    def create_ticket(self, user, title="Ticket"):
+        ticket = Ticket(user=user, title=title)
+        ticket.save()
+        return self.set_time_created(ticket)
+
+    def create_review(self, user, ticket, headline="Review", rating=3):
+        review = Review(user=user, ticket=ticket,
+                        headline=headline, rating=rating)
+        review.save()
+        return self.set_time_created(review)
+
+    def set_time_created(self, post):
+        # auto_now_add ignores given values, posts are spaced by one minute
+        self.minutes += 1
+        post.time_created = self.start + timedelta(minutes=self.minutes)
+        type(post).objects.filter(id=post.id).update(
+            time_created=post.time_created
+        )
+        return post
+
+    def upload_image(self, name="photo.jpg", size=(1000, 600)):
+        content = BytesIO()
+        Image.new("RGB", size, "teal").save(content, "JPEG")
+        return SimpleUploadedFile(name, content.getvalue(), "image/jpeg")
+
+    def login(self, user=None):
+        self.client.login(username=(user or self.user).username,
+                          password=self.password)
+
+
+class FeedTests(ReviewTestCase):
+    def test_feed_merges_posts_newest_first(self):
+        own_ticket = self.create_ticket(self.user)
+        followed_ticket = self.create_ticket(self.followed)
+        self.create_ticket(self.stranger)
+        stranger_review = self.create_review(self.stranger, own_ticket)
+        followed_review = self.create_review(self.followed, followed_ticket)
+
+        paginator = PostPaginator(PostStream(
+            get_viewable_tickets(self.user),
+            get_viewable_reviews(self.user),
+        ))
+
+        self.assertEqual(paginator.count, 4)
+        self.assertEqual(
+            paginator.page(1).object_list,
+            [followed_review, stranger_review, followed_ticket, own_ticket],
+        )
+
+    def test_feed_pages_are_sliced_in_database(self):
+        tickets = [self.create_ticket(self.user, f"Ticket {number}")
+                   for number in range(7)]
+        self.login()
+
+        response = self.client.get(reverse("feed"), {"page": 2})
+
+        page_obj = response.context["page_obj"]
+        self.assertEqual(page_obj.paginator.num_pages, 2)
+        self.assertEqual(list(page_obj), tickets[1::-1])
+
+    def test_slices_are_pushed_into_both_sides_of_the_union(self):
+        for number in range(4):
+            ticket = self.create_ticket(self.followed, f"Ticket {number}")
+            self.create_review(self.user, ticket)
+            # posts at the same time are ordered by type then id
+            Review.objects.filter(ticket=ticket).update(
+                time_created=ticket.time_created
+            )
+        keys = PostStream(get_viewable_tickets(self.user),
+                          get_viewable_reviews(self.user)).keys()
+
+        everything = list(keys.union())
+        self.assertEqual(len(everything), 8)
+        for start, stop in ((0, 3), (2, 5), (5, 9), (8, 10)):
+            self.assertEqual(keys[start:stop], everything[start:stop])
+
+    def test_only_unanswered_tickets_can_be_answered_from_feed(self):
+        answered = self.create_ticket(self.followed, "Ticket répondu")
+        unanswered = self.create_ticket(self.followed, "Ticket sans réponse")
+        Review.objects.create(self.user, ReviewForm(
+            {"headline": "Critique", "rating": 4}
+        ), answered)
+        self.login()
+
+        response = self.client.get(reverse("feed"))
+
+        self.assertNotContains(
+            response, reverse("create-review-response", args=[answered.id])
+        )
+        self.assertContains(
+            response, reverse("create-review-response", args=[unanswered.id])
+        )
+
+
+class ReviewStatsTests(ReviewTestCase):
+    def review_form(self, rating):
+        form = ReviewForm({"headline": "Critique", "rating": rating})
+        self.assertTrue(form.is_valid())
+        return form
+
+    def assertStats(self, ticket, review_count, rating_sum):
+        ticket.refresh_from_db()
+        self.assertEqual((ticket.review_count, ticket.rating_sum),
+                         (review_count, rating_sum))
+
+    def test_stats_follow_reviews(self):
+        ticket = self.create_ticket(self.user)
+        first = Review.objects.create(self.followed, self.review_form(4),
+                                      ticket)
+        Review.objects.create(self.stranger, self.review_form(1), ticket)
+        self.assertStats(ticket, 2, 5)
+        self.assertEqual(ticket.avg_rating, 2.5)
+
+        Review.objects.update(first, self.review_form(2))
+        self.assertStats(ticket, 2, 3)
+
+        first.delete()
+        self.assertStats(ticket, 1, 1)
+
+    def test_repair_command_recomputes_stats(self):
+        tickets = [self.create_ticket(self.user) for _ in range(2)]
+        self.create_review(self.followed, tickets[0], rating=5)
+        Ticket.objects.filter(id=tickets[1].id).update(review_count=3)
+
+        out = StringIO()
+        call_command("repair_review_stats", stdout=out)
+
+        self.assertIn("dont 2 qui étaient faux", out.getvalue())
+        self.assertStats(tickets[0], 1, 5)
+        self.assertStats(tickets[1], 0, 0)
+        self.assertIsNone(tickets[1].avg_rating)
+
+
+class FeedQueryCountTests(ReviewTestCase):
+    def create_posts(self, number):
+        for _ in range(number):
+            ticket = self.create_ticket(self.followed)
+            self.create_review(self.stranger, ticket)
+            self.create_review(self.user, ticket)
+            own_ticket = self.create_ticket(self.user)
+            self.create_review(self.followed, own_ticket)
+
+    def test_feed_renders_in_constant_number_of_queries(self):
+        self.login()
+        self.create_posts(3)
+        # user, follows, count, page keys, tickets, reviews, the session
+        # is cached
+        with self.assertNumQueries(6):
+            self.client.get(reverse("feed"))
+
+        # the user and follows are cached
+        self.create_posts(10)
+        with self.assertNumQueries(4):
+            self.client.get(reverse("feed"), {"page": 3})
+
+    def test_explain_feed_prints_the_plan_of_each_feed_query(self):
+        self.create_posts(3)
+        out = StringIO()
+
+        call_command("explain_feed", "toto", stdout=out)
+
+        # count, page keys, tickets, reviews
+        self.assertIn("feed page (4/4)", out.getvalue())
+        self.assertIn("USING INDEX review_user_time_idx", out.getvalue())
+
+    def test_posts_page_renders_in_constant_number_of_queries(self):
+        self.login()
+        self.create_posts(10)
+        # user, count, page keys, tickets, reviews
+        with self.assertNumQueries(5):
+            self.client.get(reverse("posts"), {"page": 2})
+
+    def test_follows_page_renders_in_constant_number_of_queries(self):
+        for number in range(5):
+            user = self.create_user(f"user{number}")
+            UserFollows(user=self.user, followed_user=user).save()
+            UserFollows(user=user, followed_user=self.user).save()
+        self.login()
+        # user, follows, followers
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("follows"))
+        with self.assertNumQueries(0):
+            self.client.get(reverse("follows"))
+
+        self.assertContains(response, "user4", count=2)
+
+
+class FollowGraphCacheTests(ReviewTestCase):
+    def follow_form(self, username):
+        form = FollowForm({"followed_name": username})
+        self.assertTrue(form.is_valid())
+        return form
+
+    def test_follow_graph_is_cached_until_follows_change(self):
+        self.assertEqual(UserFollows.objects.followed_ids(self.user.id),
+                         [self.followed.id])
+        self.assertEqual(UserFollows.objects.follower_ids(self.followed.id),
+                         [self.user.id])
+        with self.assertNumQueries(0):
+            UserFollows.objects.followed_ids(self.user.id)
+            UserFollows.objects.follower_ids(self.followed.id)
+
+        follow = UserFollows.objects.create(self.user,
+                                            self.follow_form("tata"))
+        self.assertEqual(UserFollows.objects.followed_ids(self.user.id),
+                         [self.stranger.id, self.followed.id])
+        self.assertEqual(UserFollows.objects.follower_ids(self.stranger.id),
+                         [self.user.id])
+
+        follow.delete()
+        self.assertEqual(UserFollows.objects.follower_ids(self.stranger.id),
+                         [])
+
+    def test_import_invalidates_follow_graph(self):
+        self.assertEqual(UserFollows.objects.follower_ids(self.stranger.id),
+                         [])
+
+        UserFollows.objects.import_follows(self.user, ["tata"])
+
+        self.assertEqual(UserFollows.objects.follower_ids(self.stranger.id),
+                         [self.user.id])
+
+
+class AsyncViewTests(ReviewTestCase):
+    async def test_feed_is_served_by_the_asgi_handler(self):
+        ticket = await Ticket.objects.acreate(user=self.followed,
+                                              title="Ticket suivi")
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.user)
+
+        response = await client.get(reverse("feed"))
+
+        self.assertContains(response, ticket.title)
+
+    async def test_async_request_is_measured(self):
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.user)
+
+        with self.settings(REQUEST_INSTRUMENTATION_SAMPLE_RATE=1), \
+                self.assertLogs("litreview.instrumentation", "INFO"):
+            response = await client.get(reverse("feed"))
+
+        self.assertRegex(response["Server-Timing"], r'desc="[1-9]\d* queries"')
+
+    async def test_anonymous_user_is_redirected_to_login(self):
+        response = await AsyncClient().get(reverse("follows"))
+
+        self.assertRedirects(response, "/login/?next=/follows/",
+                             fetch_redirect_response=False)
+
+
+class LiveFeedTests(ReviewTestCase):
+    async def open_stream(self, user):
+        client = AsyncClient()
+        if user:
+            await sync_to_async(client.force_login)(user)
+        cookie = client.cookies.get(settings.SESSION_COOKIE_NAME)
+        headers = [(b"cookie", f"{settings.SESSION_COOKIE_NAME}="
+                               f"{cookie.value}".encode())] if cookie else []
+        sent = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        application = FeedEventsMiddleware(None)
+        task = asyncio.ensure_future(application(
+            {"type": "http", "method": "GET", "path": "/feed/events/",
+             "query_string": b"", "headers": headers},
+            receive, sent.put,
+        ))
+        return task, sent, disconnected
+
+    def create_ticket_and_review(self, user, title):
+        ticket_form = TicketForm({"title": title})
+        ticket_form.is_valid()
+        review_form = ReviewForm({"headline": "Critique", "rating": 4})
+        review_form.is_valid()
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = Ticket.objects.create(user, ticket_form)
+            review = Review.objects.create(user, review_form, ticket)
+        return ticket, review
+
+    async def test_followers_receive_new_posts(self):
+        task, sent, disconnected = await self.open_stream(self.user)
+        start = await asyncio.wait_for(sent.get(), 5)
+        self.assertEqual(start["status"], 200)
+        await sent.get()
+
+        await sync_to_async(self.create_ticket_and_review)(self.stranger,
+                                                           "Inconnu")
+        ticket, review = await sync_to_async(self.create_ticket_and_review)(
+            self.followed, "Suivi"
+        )
+        events = [(await asyncio.wait_for(sent.get(), 5))["body"]
+                  for _ in range(2)]
+
+        self.assertIn(f'"post_id": {ticket.id}'.encode(), events[0])
+        self.assertIn(f'"post_type": "review", "post_id": {review.id}'
+                      .encode(), events[1])
+        self.assertTrue(sent.empty())
+        disconnected.set()
+        await asyncio.wait_for(task, 5)
+        self.assertNotIn(self.user.id, get_broker().subscriptions)
+
+    async def test_anonymous_stream_is_forbidden(self):
+        task, sent, _ = await self.open_stream(None)
+        await asyncio.wait_for(task, 5)
+
+        self.assertEqual((await sent.get())["status"], 403)
+
+    def test_snippet_of_a_viewable_post_only(self):
+        shown = self.create_ticket(self.followed, "Ticket suivi")
+        hidden = self.create_ticket(self.stranger, "Ticket inconnu")
+        self.login()
+
+        response = self.client.get(reverse("post-snippet",
+                                           args=["ticket", shown.id]))
+        self.assertContains(response, f'data-post="ticket-{shown.id}"')
+        self.assertContains(response, "Ticket suivi")
+        response = self.client.get(reverse("post-snippet",
+                                           args=["ticket", hidden.id]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_feed_opens_the_stream_under_asgi(self):
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.user)
+
+        response = await client.get(reverse("feed"))
+        self.assertContains(response, 'data-events="/feed/events/"')
+        self.assertContains(response, "js/feed.js")
+
+        await sync_to_async(self.client.force_login)(self.user)
+        response = await sync_to_async(self.client.get)(reverse("feed"))
+        self.assertNotContains(response, "js/feed.js")
+
+
+class FollowImportTests(ReviewTestCase):
+    def test_import_reports_each_name_in_constant_queries(self):
+        for number in range(20):
+            self.create_user(f"user{number}")
+        usernames = ["titi", "toto", "inconnu", "user0", "user0",
+                     *(f"user{number}" for number in range(1, 20))]
+
+        # users, follows, insert, inside a savepoint
+        with self.assertNumQueries(5):
+            results = UserFollows.objects.import_follows(self.user,
+                                                         usernames)
+
+        self.assertEqual(results[:4], [("titi", "already_followed"),
+                                       ("toto", "own_username"),
+                                       ("inconnu", "unknown_user"),
+                                       ("user0", "followed")])
+        self.assertEqual(len(results), 23)
+        self.assertEqual(UserFollows.objects.filter(user=self.user).count(),
+                         21)
+
+    def test_export_can_be_imported_back(self):
+        self.create_user("user0")
+        UserFollows.objects.import_follows(self.user, ["user0"])
+        self.login()
+
+        response = self.client.get(reverse("export-follows"))
+        self.assertEqual(response.content, b"titi\nuser0\n")
+
+        self.login(self.stranger)
+        upload = SimpleUploadedFile("abonnements.txt", response.content,
+                                    "text/plain")
+        response = self.client.post(reverse("import-follows"),
+                                    {"usernames": upload})
+
+        self.assertContains(response,
+                            "user0 : ajouté à votre liste de suivi")
+        self.assertEqual(
+            list(UserFollows.objects.followed_usernames(self.stranger)),
+            ["titi", "user0"],
+        )
+
+    def test_export_command_writes_the_followed_usernames(self):
+        self.create_user("user0")
+        UserFollows.objects.import_follows(self.user, ["user0"])
+
+        out = StringIO()
+        call_command("export_follows", "toto", stdout=out)
+        self.assertEqual(out.getvalue(), "titi\nuser0\n")
+
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "abonnements.txt"
+            call_command("export_follows", "toto", "--output", str(path))
+            self.assertEqual(path.read_text(), "titi\nuser0\n")
+
+    def test_import_rejects_non_text_file(self):
+        self.login()
+        upload = SimpleUploadedFile("photo.jpg", b"\xff\xd8\xff\xe0",
+                                    "image/jpeg")
+
+        response = self.client.post(reverse("import-follows"),
+                                    {"usernames": upload})
+
+        self.assertFormError(
+            response.context["form"], "usernames",
+            "Le fichier doit être un texte encodé en UTF-8.",
+        )
+
+    def test_import_rejects_file_larger_than_the_limit(self):
+        self.create_user("user0")
+        self.login()
+        content = b"x" * (MAX_IMPORT_FILE_SIZE - 5) + b"\nuser0123\n"
+        upload = SimpleUploadedFile("abonnements.txt", content,
+                                    "text/plain")
+
+        response = self.client.post(reverse("import-follows"),
+                                    {"usernames": upload})
+
+        self.assertFormError(response.context["form"], "usernames",
+                             "Le fichier ne doit pas dépasser 760 Ko.")
+        self.assertFalse(UserFollows.objects.filter(
+            user=self.user, followed_user__username="user0"
+        ).exists())
+
+    @override_settings(TICKET_IMAGE_MAX_SIZE=1024)
+    def test_import_is_not_cut_at_the_image_limit(self):
+        self.create_user("user0")
+        self.login()
+        content = b"\n" * 2000 + b"user0\n"
+
+        self.client.post(reverse("import-follows"), {
+            "usernames": SimpleUploadedFile("abonnements.txt", content,
+                                            "text/plain"),
+        })
+
+        self.assertTrue(UserFollows.objects.filter(
+            user=self.user, followed_user__username="user0"
+        ).exists())
+
+    @override_settings(FEED_INBOX=True)
+    def test_import_backfills_inbox(self):
+        ticket = self.create_ticket(self.stranger)
+        call_command("rebuild_feed_inbox", stdout=StringIO())
+
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "abonnements.txt"
+            path.write_text("tata\n")
+            out = StringIO()
+            call_command("import_follows", "toto", str(path), stdout=out)
+
+        self.assertEqual(out.getvalue(),
+                         "tata : ajouté à votre liste de suivi\n")
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post_type="ticket", post_id=ticket.id
+        ).exists())
+
+
+class SearchTests(ReviewTestCase):
+    def search(self, query, user=None):
+        user = user or self.user
+        stream = SearchStream(query, get_viewable_tickets(user),
+                              get_viewable_reviews(user))
+        return stream.hydrate(list(stream.keys()[:20]))
+
+    def test_search_matches_prefixes_without_accents(self):
+        ticket = self.create_ticket(self.followed, "Les Misérables")
+        review = self.create_review(self.user, ticket, "Un grand roman")
+        self.create_ticket(self.followed, "Germinal")
+
+        self.assertEqual(self.search("miserab"), [ticket])
+        self.assertEqual(self.search("ROMAN grand"), [review])
+
+    def test_search_is_restricted_to_viewable_posts(self):
+        hidden = self.create_ticket(self.stranger, "Roman caché")
+        shown = self.create_ticket(self.followed, "Roman suivi")
+
+        self.assertEqual(self.search("roman"), [shown])
+        self.assertEqual(self.search("roman", self.stranger), [hidden])
+
+    def test_index_follows_updates_and_deletions(self):
+        ticket = self.create_ticket(self.user, "Germinal")
+        ticket.title = "Nana"
+        ticket.save()
+        self.assertEqual(self.search("germinal"), [])
+        self.assertEqual(self.search("nana"), [ticket])
+
+        ticket.delete()
+        self.assertEqual(self.search("nana"), [])
+
+    def test_best_matches_come_first(self):
+        once = self.create_ticket(self.user, "Poésie et roman")
+        twice = self.create_ticket(self.user, "Poésie, encore poésie")
+
+        self.assertEqual(self.search("poésie"), [twice, once])
+
+    def test_search_page_is_paginated_and_keeps_the_query(self):
+        for number in range(7):
+            self.create_ticket(self.user, f"Roman {number}")
+        self.login()
+
+        response = self.client.get(reverse("search"), {"q": "roman",
+                                                       "page": 2})
+
+        self.assertEqual(len(response.context["page_obj"]), 2)
+        self.assertContains(response, "?page=1&amp;q=roman")
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.create_ticket(self.user, "Roman")
+        self.login()
+
+        for query in ['"', "AND", "roman OR", "*", "NEAR(roman"]:
+            response = self.client.get(reverse("search"), {"q": query})
+            self.assertEqual(response.status_code, 200)
+
+
+class ConditionalGetTests(ReviewTestCase):
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params,
+                               HTTP_IF_NONE_MATCH=response.headers["ETag"])
+
+    def test_unchanged_feed_is_not_modified_without_queries(self):
+        self.create_ticket(self.followed)
+        self.login()
+        response = self.client.get(reverse("feed"))
+        self.assertEqual(
+            set(response.headers["Cache-Control"].split(", ")),
+            {"private", "no-cache"},
+        )
+        self.assertIn("Last-Modified", response.headers)
+
+        with self.assertNumQueries(0):
+            not_modified = self.revalidate(reverse("feed"), response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.headers["ETag"],
+                         response.headers["ETag"])
+
+        other_page = self.revalidate(reverse("feed"), response, page=2)
+        self.assertEqual(other_page.status_code, 200)
+
+        self.create_ticket(self.followed, "Nouveau ticket")
+        response = self.revalidate(reverse("feed"), response)
+        self.assertContains(response, "Nouveau ticket")
+
+    def test_feed_changes_when_a_followed_ticket_is_answered(self):
+        ticket = self.create_ticket(self.followed)
+        respond_url = reverse("create-review-response", args=[ticket.id])
+        self.login()
+        response = self.client.get(reverse("feed"))
+        self.assertContains(response, respond_url)
+
+        # by a user the viewer doesn't follow
+        Review.objects.create(self.stranger, ReviewForm(
+            {"headline": "Critique", "rating": 4}
+        ), ticket)
+        response = self.revalidate(reverse("feed"), response)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, respond_url)
+
+    def test_feed_changes_with_the_ticket_of_a_followed_review(self):
+        ticket = self.create_ticket(self.stranger, "Ancien titre")
+        self.create_review(self.followed, ticket)
+        self.login()
+        response = self.client.get(reverse("feed"))
+        self.assertContains(response, "Ancien titre")
+
+        form = TicketForm({"title": "Nouveau titre"})
+        form.is_valid()
+        Ticket.objects.update(ticket, form)
+        response = self.revalidate(reverse("feed"), response)
+
+        self.assertContains(response, "Nouveau titre")
+
+    def test_feed_is_not_modified_since_last_change(self):
+        self.login()
+        response = self.client.get(reverse("posts"))
+
+        not_modified = self.client.get(
+            reverse("posts"),
+            HTTP_IF_MODIFIED_SINCE=response.headers["Last-Modified"],
+        )
+
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_posts_page_changes_with_reviews_of_own_tickets(self):
+        ticket = self.create_ticket(self.user)
+        self.login()
+        response = self.client.get(reverse("posts"))
+        self.assertEqual(self.revalidate(reverse("posts"),
+                                         response).status_code, 304)
+
+        self.create_review(self.stranger, ticket)
+
+        self.assertEqual(self.revalidate(reverse("posts"),
+                                         response).status_code, 200)
+
+    def test_follows_page_changes_with_new_followers(self):
+        self.login()
+        response = self.client.get(reverse("follows"))
+        self.assertEqual(self.revalidate(reverse("follows"),
+                                         response).status_code, 304)
+
+        UserFollows(user=self.stranger, followed_user=self.user).save()
+
+        self.assertContains(self.revalidate(reverse("follows"), response),
+                            "tata")
+
+    def test_pending_messages_are_rendered(self):
+        self.login()
+        response = self.client.get(reverse("follows"))
+
+        self.client.post(reverse("follows"), {"followed_name": "inconnu"})
+        response = self.revalidate(reverse("follows"), response)
+
+        self.assertContains(response,
+                            "Aucun utilisateur ne correspond à ce nom.")
+
+
+class PostedAtDisplayTests(ReviewTestCase):
+    def test_dates_are_written_in_french_whatever_the_locale(self):
+        self.assertEqual(
+            get_posted_at_display({}, datetime(2023, 8, 4, 9, 5, 59)),
+            "09:05, 04 août 2023",
+        )
+        self.assertEqual(
+            get_posted_at_display({}, datetime(2022, 12, 31, 23, 59)),
+            "23:59, 31 décembre 2022",
+        )
+
+    def test_snippets_show_the_date_of_the_post(self):
+        self.create_ticket(self.user)
+        self.login()
+
+        response = self.client.get(reverse("feed"))
+
+        self.assertContains(response, "12:01, 01 mai 2023")
+
+
+class FeedCacheTests(ReviewTestCase):
+    def assertFeedCached(self):
+        self.create_ticket(self.user)
+        self.login()
+        first = self.client.get(reverse("feed"))
+
+        # page tickets, the session and user are cached
+        with self.assertNumQueries(1):
+            cached = self.client.get(reverse("feed"))
+        self.assertEqual(list(cached.context["page_obj"]),
+                         list(first.context["page_obj"]))
+
+        ticket = self.create_ticket(self.followed, "Nouveau ticket")
+        response = self.client.get(reverse("feed"))
+        self.assertEqual(response.context["page_obj"][0], ticket)
+
+        follow = UserFollows.objects.get(user=self.user)
+        follow.delete()
+        response = self.client.get(reverse("feed"))
+        self.assertNotIn(ticket, response.context["page_obj"])
+
+    def test_feed_pages_cached_in_memory(self):
+        self.assertFeedCached()
+
+    def test_feed_pages_cached_in_files(self):
+        with TemporaryDirectory() as location:
+            backend = "django.core.cache.backends.filebased.FileBasedCache"
+            with self.settings(CACHES={"default": {"BACKEND": backend,
+                                                   "LOCATION": location}}):
+                self.assertFeedCached()
+
+
+class SnippetCacheTests(ReviewTestCase):
+    def test_snippets_shared_between_viewers_and_refreshed_on_update(self):
+        ticket = self.create_ticket(self.followed, "Ancien titre")
+        self.create_review(self.user, ticket, headline="Ma critique")
+
+        self.login()
+        response = self.client.get(reverse("feed"))
+        self.assertContains(response, "Vous avez publié une critique")
+        self.assertContains(response, "titi a demandé une critique")
+
+        self.login(self.followed)
+        response = self.client.get(reverse("posts"))
+        self.assertContains(response, "Vous avez demandé une critique")
+
+        form = TicketForm({"title": "Nouveau titre"})
+        form.is_valid()
+        Ticket.objects.update(ticket, form)
+        self.login()
+        response = self.client.get(reverse("feed"))
+        self.assertContains(response, "Nouveau titre", count=2)
+        self.assertNotContains(response, "Ancien titre")
+
+
+class MediaTestCase(ReviewTestCase):
+    def setUp(self):
+        super().setUp()
+        # uploads go to a temporary directory, renditions are made inline
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = Path(media.name)
+        overridden = self.settings(MEDIA_ROOT=media.name,
+                                   IMAGE_RENDITION_WORKERS=0)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+
+
+class ImageRenditionTests(MediaTestCase):
+    def test_renditions_made_after_commit_and_served_in_srcset(self):
+        form = TicketForm({"title": "Ticket"},
+                          {"image": self.upload_image()})
+        form.is_valid()
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = Ticket.objects.create(self.user, form)
+
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.rendition_widths, [200, 400, 800])
+        for width in ticket.rendition_widths:
+            for extension in ("webp", "jpg"):
+                name = rendition_name(ticket.image.name, width, extension)
+                with default_storage.open(name) as file:
+                    self.assertEqual(Image.open(file).width, width)
+
+        self.login()
+        response = self.client.get(reverse("feed"))
+        self.assertContains(response, "photo-400w.webp 400w")
+
+    def test_small_images_are_kept_as_is(self):
+        form = TicketForm({"title": "Ticket"},
+                          {"image": self.upload_image(size=(150, 100))})
+        form.is_valid()
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = Ticket.objects.create(self.user, form)
+
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.rendition_widths, [])
+
+    def test_command_makes_the_missing_renditions(self):
+        form = TicketForm({"title": "Ticket"},
+                          {"image": self.upload_image()})
+        form.is_valid()
+        # the callbacks which would make the renditions are not run
+        with self.captureOnCommitCallbacks():
+            ticket = Ticket.objects.create(self.user, form)
+
+        out = StringIO()
+        call_command("make_image_renditions", stdout=out)
+
+        self.assertEqual(out.getvalue(), f"{ticket.image.name}\n")
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.rendition_widths, [200, 400, 800])
+
+
+class WorkerTests(TestCase):
+    def test_failure_in_a_worker_is_logged(self):
+        def fail(name):
+            raise ValueError(name)
+
+        with self.assertLogs("review.workers", "ERROR") as logs:
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule("tests", 1, fail, "photo.jpg")
+            # the single thread of the pool runs the calls in order
+            get_executor("tests", 1).submit(lambda: None).result()
+        self.assertIn("fail('photo.jpg',) failed in a worker.",
+                      logs.output[0])
+
+
+@override_settings(DELETE_SWEEP_IN_BACKGROUND=False)
+class DeletionSweepTests(MediaTestCase):
+    def create_ticket_with_image(self, user):
+        form = TicketForm({"title": "Ticket illustré"},
+                          {"image": self.upload_image()})
+        form.is_valid()
+        with self.captureOnCommitCallbacks(execute=True):
+            return Ticket.objects.create(user, form)
+
+    def test_deleted_ticket_is_hidden_then_swept_with_its_files(self):
+        ticket = self.create_ticket_with_image(self.user)
+        self.create_review(self.followed, ticket, headline="Réponse")
+        files = list(self.media.rglob("*.*"))
+        self.assertEqual(len(files), 7)
+        reclaimed = sum(file.stat().st_size for file in files)
+        self.login()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse("delete-ticket", args=[ticket.id]))
+        self.assertFalse(Ticket.objects.filter(id=ticket.id).exists())
+        self.assertTrue(Ticket.all_objects.filter(id=ticket.id).exists())
+        response = self.client.get(reverse("feed"))
+        self.assertNotContains(response, "Réponse")
+        self.assertNotContains(response, "Ticket illustré")
+
+        with self.assertLogs("review.sweeper", "INFO") as logs:
+            for callback in callbacks:
+                callback()
+
+        self.assertFalse(Ticket.all_objects.exists())
+        self.assertFalse(Review.objects.exists())
+        self.assertEqual(list(self.media.rglob("*.*")), [])
+        self.assertIn(f"{reclaimed} bytes reclaimed", logs.output[0])
+
+    def test_shared_image_is_kept_until_its_last_ticket_is_swept(self):
+        ticket = self.create_ticket_with_image(self.user)
+        shared = Ticket(user=self.user, title="Copie",
+                        image=ticket.image.name)
+        shared.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.mark_deleted(ticket)
+        self.assertTrue(default_storage.exists(ticket.image.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.mark_deleted(shared)
+        self.assertFalse(default_storage.exists(ticket.image.name))
+
+    @override_settings(FEED_INBOX=True)
+    def test_marking_does_not_query_each_review(self):
+        ticket = self.create_ticket(self.followed)
+        self.create_review(self.stranger, ticket)
+
+        def queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                Ticket.objects.mark_deleted(ticket)
+            return len(context)
+
+        expected = queries()
+        for index in range(3):
+            self.create_review(self.stranger, ticket, headline=str(index))
+        self.assertEqual(queries(), expected)
+
+    def test_only_the_owner_deletes_a_ticket(self):
+        ticket = self.create_ticket(self.followed)
+        self.login()
+
+        response = self.client.post(reverse("delete-ticket",
+                                            args=[ticket.id]))
+
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Ticket.objects.filter(id=ticket.id).exists())
+
+    @override_settings(FEED_INBOX=True)
+    def test_sweep_does_not_query_each_post(self):
+        def sweep(tickets):
+            for _ in range(tickets):
+                ticket = self.create_ticket(self.followed, "Épuisé")
+                self.create_review(self.user, ticket, headline="Épuisé")
+                self.create_review(self.stranger, ticket)
+                Ticket.all_objects.filter(id=ticket.id).update(
+                    time_deleted=datetime.now()
+                )
+            with CaptureQueriesContext(connection) as context:
+                sweep_deleted_tickets()
+            return len(context)
+
+        expected = sweep(1)
+        self.assertEqual(sweep(4), expected)
+        self.assertFalse(Review.objects.exists())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM review_search")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_orphaned_files_are_collected(self):
+        ticket = self.create_ticket_with_image(self.user)
+        for name in ("orphelin.jpg", "renditions/orphelin-200w.jpg",
+                     "recent.jpg", "backgrounds/fond.jpg"):
+            path = self.media / name
+            path.parent.mkdir(exist_ok=True)
+            path.write_bytes(b"x" * 10)
+            if name != "recent.jpg":
+                os.utime(path, (0, 0))
+
+        out = StringIO()
+        call_command("sweep_deleted", "--dry-run", stdout=out)
+        self.assertEqual(out.getvalue(),
+                         "2 fichiers orphelins à supprimer, "
+                         "20 octets libérés.\n")
+
+        out = StringIO()
+        call_command("sweep_deleted", stdout=out)
+        self.assertEqual(out.getvalue(),
+                         "0 tickets supprimés, 0 octets libérés.\n"
+                         "2 fichiers orphelins supprimés, "
+                         "20 octets libérés.\n")
+        self.assertFalse((self.media / "orphelin.jpg").exists())
+        self.assertTrue((self.media / "recent.jpg").exists())
+        self.assertTrue((self.media / "backgrounds/fond.jpg").exists())
+        self.assertTrue(default_storage.exists(ticket.image.name))
+
+
+class ImageUploadTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def post_ticket(self, image):
+        return self.client.post(reverse("create-ticket"),
+                                {"title": "Ticket", "image": image})
+
+    @override_settings(TICKET_IMAGE_MAX_SIZE=1024)
+    def test_too_large_upload_is_aborted(self):
+        response = self.post_ticket(self.upload_image(size=(400, 400)))
+
+        self.assertRedirects(response, reverse("create-ticket"),
+                             fetch_redirect_response=False)
+        self.assertFalse(Ticket.objects.exists())
+        response = self.client.get(reverse("create-ticket"))
+        self.assertContains(response, "L&#x27;image ne doit pas dépasser")
+
+    def test_upload_views_check_the_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.login(username=self.user.username, password=self.password)
+
+        response = client.post(reverse("create-ticket"),
+                               {"title": "Ticket"})
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Ticket.objects.exists())
+
+    @override_settings(TICKET_IMAGE_MAX_SIZE=1024)
+    def test_handler_stops_reading_past_the_limit(self):
+        handler = SizeLimitedUploadHandler()
+        handler.new_file("image", "photo.jpg", "image/jpeg", None)
+
+        handler.receive_data_chunk(b"x" * 1000, 0)
+        with self.assertRaises(StopUpload) as context:
+            handler.receive_data_chunk(b"x" * 1000, 1000)
+        self.assertTrue(context.exception.connection_reset)
+
+    @override_settings(TICKET_IMAGE_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels_are_rejected_from_header(self):
+        form = TicketForm({"title": "Ticket"},
+                          {"image": self.upload_image(size=(200, 200))})
+
+        self.assertTrue(form.has_error("image", "image_too_many_pixels"))
+
+        response = self.post_ticket(self.upload_image(size=(200, 200)))
+        self.assertRedirects(response, reverse("create-ticket"))
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_image_within_limits_is_saved(self):
+        response = self.post_ticket(self.upload_image(size=(400, 400)))
+
+        self.assertRedirects(response, reverse("feed"))
+        self.assertTrue(Ticket.objects.get().image)
+
+
+class FileServingTests(TestCase):
+    def setUp(self):
+        root = TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = Path(root.name)
+        self.content = b"body { color: teal; }" * 50
+        (self.root / "style.0123456789ab.css").write_bytes(self.content)
+        (self.root / "style.0123456789ab.css.gz").write_bytes(
+            gzip.compress(self.content)
+        )
+        (self.root / "photo.jpg").write_bytes(b"jpeg")
+        self.factory = RequestFactory()
+
+    def get(self, path, max_age=0, **headers):
+        request = self.factory.get(f"/media/{path}", **headers)
+        return serve(request, path, document_root=self.root, max_age=max_age)
+
+    def get_static(self, path, **headers):
+        request = self.factory.get(f"/static/{path}", **headers)
+        with self.settings(STATIC_ROOT=self.root):
+            return serve_static(request, path)
+
+    def test_hashed_file_is_immutable_and_precompressed(self):
+        response = self.get_static("style.0123456789ab.css",
+                                   HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)),
+            self.content,
+        )
+
+    def test_unchanged_file_is_not_modified(self):
+        etag = self.get("photo.jpg", max_age=60)["ETag"]
+
+        response = self.get("photo.jpg", max_age=60, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+
+    def test_compressed_copies_are_not_served_directly(self):
+        with self.assertRaises(Http404):
+            self.get("style.0123456789ab.css.gz")
+
+    def test_media_with_a_hash_like_name_is_not_immutable(self):
+        response = self.get("style.0123456789ab.css", max_age=60)
+
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+
+    def test_static_files_are_served_before_collectstatic(self):
+        response = self.get_static("css/style.css")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+
+class InstrumentationTests(ReviewTestCase):
+    @override_settings(REQUEST_INSTRUMENTATION_SAMPLE_RATE=1)
+    def test_sampled_request_is_measured(self):
+        self.create_ticket(self.followed)
+        self.login()
+
+        with self.assertLogs("litreview.instrumentation", "INFO") as logs:
+            response = self.client.get(reverse("feed"))
+
+        self.assertRegex(response["Server-Timing"],
+                         r'^db;dur=[\d.]+;desc="\d+ queries", '
+                         r'tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertIn('"view": "feed"', logs.output[0])
+
+    @override_settings(REQUEST_INSTRUMENTATION_SAMPLE_RATE=1,
+                       REQUEST_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_statement_is_logged_as_n_plus_one(self):
+        for _ in range(3):
+            self.create_ticket(self.user)
+
+        def view(request):
+            for ticket in Ticket.objects.all():
+                ticket.user.username
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(view)
+        with self.assertLogs("litreview.instrumentation", "WARNING") as logs:
+            middleware(RequestFactory().get("/"))
+
+        self.assertIn('"count": 3', logs.output[0])
+        self.assertIn('"n_plus_one": ["SELECT', logs.output[0])
+
+    def test_unsampled_request_is_not_measured(self):
+        self.login()
+
+        response = self.client.get(reverse("feed"))
+
+        self.assertNotIn("Server-Timing", response)
+
+
+class DatabaseTests(TestCase):
+    def pragma(self, name, tuning):
+        new_connection = connections.create_connection("default")
+        try:
+            with self.settings(SQLITE_TUNING=tuning), \
+                    new_connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA {name}")
+                return cursor.fetchone()[0]
+        finally:
+            new_connection.close()
+
+    def test_pragmas_are_applied_to_new_connections_when_tuning(self):
+        self.assertEqual(self.pragma("synchronous", True), 1)  # NORMAL
+        self.assertEqual(self.pragma("busy_timeout", True), 5000)
+        self.assertEqual(self.pragma("cache_size", True), -20000)
+
+    def test_pragmas_are_not_applied_by_default(self):
+        self.assertEqual(self.pragma("synchronous", False), 2)  # FULL
+
+
+class DatasetTests(TestCase):
+    def generate(self, prefix):
+        DatasetGenerator(users=12, follows=4, tickets=3, review_ratio=0.5,
+                         image_ratio=0, seed=7, prefix=prefix).generate()
+        return list(Ticket.objects.filter(
+            user__username__startswith=prefix
+        ).order_by("id").values_list("title", "time_created"))
+
+    def test_dataset_is_reproducible(self):
+        tickets = self.generate("a")
+
+        self.assertEqual(len(tickets), 12 * 3)
+        self.assertEqual(Review.objects.count(), 18)
+        self.assertEqual(UserFollows.objects.filter(
+            user__username="a0").count(), 4)
+        self.assertEqual(self.generate("b"), tickets)
+
+
+class CursorPaginationTests(ReviewTestCase):
+    def test_cursor_pages_walk_the_stream_both_ways(self):
+        posts = []
+        for number in range(4):
+            ticket = self.create_ticket(self.user, f"Ticket {number}")
+            review = self.create_review(self.followed, ticket)
+            # a ticket and a review sharing the same timestamp
+            Review.objects.filter(id=review.id).update(
+                time_created=ticket.time_created
+            )
+            posts += [review, ticket]
+        posts.reverse()
+        paginator = CursorPaginator(PostStream(
+            get_viewable_tickets(self.user),
+            get_viewable_reviews(self.user),
+        ), per_page=3)
+
+        first = paginator.get_page()
+        second = paginator.get_page(after=first.next_cursor)
+        third = paginator.get_page(after=second.next_cursor)
+        back = paginator.get_page(before=third.previous_cursor)
+
+        self.assertEqual(first.object_list, posts[:3])
+        self.assertFalse(first.has_previous())
+        self.assertEqual(second.object_list, posts[3:6])
+        self.assertEqual(third.object_list, posts[6:])
+        self.assertFalse(third.has_next())
+        self.assertEqual(back.object_list, posts[3:6])
+        self.assertTrue(back.has_previous())
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        ticket = self.create_ticket(self.user)
+        paginator = CursorPaginator(PostStream(
+            get_viewable_tickets(self.user),
+            get_viewable_reviews(self.user),
+        ))
+
+        page = paginator.get_page(after="not-a-cursor")
+
+        self.assertEqual(page.object_list, [ticket])
+
+    def test_feed_renders_cursor_links(self):
+        for number in range(6):
+            self.create_ticket(self.user, f"Ticket {number}")
+        request = RequestFactory().get(reverse("feed"))
+        request.user = self.user
+        request._messages = []
+
+        view = Feed.as_view(cursor_pagination=True)
+        response = async_to_sync(view)(request)
+
+        self.assertContains(response, "?after=")
+        self.assertNotContains(response, "?page=")
+
+
+@override_settings(FEED_INBOX=True)
+class FeedInboxTests(ReviewTestCase):
+    def post_ticket(self, user):
+        form = TicketForm({"title": "Ticket"})
+        form.is_valid()
+        return Ticket.objects.create(user, form)
+
+    def post_review(self, user, ticket):
+        form = ReviewForm({"headline": "Review", "rating": 4})
+        form.is_valid()
+        return Review.objects.create(user, form, ticket)
+
+    def follow(self, user, followed_user):
+        form = FollowForm({"followed_name": followed_user.username})
+        form.is_valid()
+        return UserFollows.objects.create(user, form)
+
+    def assertInboxMatchesFeed(self, user):
+        live = PostStream(get_viewable_tickets(user),
+                          get_viewable_reviews(user))
+        self.assertEqual(list(get_feed_stream(user).keys()),
+                         list(live.keys()))
+
+    def test_inbox_follows_posts_and_follows(self):
+        own_ticket = self.post_ticket(self.user)
+        followed_ticket = self.post_ticket(self.followed)
+        self.post_review(self.stranger, own_ticket)
+        self.post_review(self.followed, own_ticket)
+        stranger_ticket = self.post_ticket(self.stranger)
+        self.post_review(self.stranger, stranger_ticket)
+        self.post_review(self.followed, followed_ticket)
+        self.assertInboxMatchesFeed(self.user)
+
+        follow = self.follow(self.user, self.stranger)
+        self.assertInboxMatchesFeed(self.user)
+
+        self.client.force_login(self.user)
+        self.client.post(reverse("delete-follow", args=[follow.id]))
+        self.assertInboxMatchesFeed(self.user)
+
+        self.client.post(reverse("delete-ticket", args=[own_ticket.id]))
+        self.assertInboxMatchesFeed(self.user)
+        self.assertInboxMatchesFeed(self.stranger)
+
+    def test_follow_skips_reviews_of_deleted_tickets(self):
+        ticket = self.post_ticket(self.stranger)
+        review = self.post_review(self.stranger, ticket)
+        Ticket.all_objects.filter(id=ticket.id).update(
+            time_deleted=datetime.now()
+        )
+
+        self.follow(self.user, self.stranger)
+
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.user, post_type="review", post_id=review.id
+        ).exists())
+        self.assertInboxMatchesFeed(self.user)
+
+    def test_cursor_pages_walk_the_inbox(self):
+        posts = []
+        for _ in range(4):
+            ticket = self.post_ticket(self.followed)
+            posts += [ticket, self.post_review(self.stranger, ticket)]
+        stream = get_feed_stream(self.user)
+        keys = list(stream.keys())
+        paginator = CursorPaginator(stream, per_page=3)
+
+        first = paginator.get_page()
+        second = paginator.get_page(after=first.next_cursor)
+        back = paginator.get_page(before=second.previous_cursor)
+
+        self.assertEqual(len(keys), 4)
+        self.assertEqual(first.object_list, stream.hydrate(keys[:3]))
+        self.assertEqual(second.object_list, stream.hydrate(keys[3:]))
+        self.assertEqual(back.object_list, first.object_list)
+
+    def test_rebuild_command_fills_inbox(self):
+        with self.settings(FEED_INBOX=False):
+            ticket = self.post_ticket(self.followed)
+            self.post_review(self.stranger, ticket)
+        self.assertFalse(FeedEntry.objects.exists())
+
+        call_command("rebuild_feed_inbox", stdout=StringIO())
+
+        self.assertInboxMatchesFeed(self.user)
+        self.assertInboxMatchesFeed(self.stranger)
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.images import get_image_dimensions
+from django.core.files.uploadhandler import TemporaryFileUploadHandler, \
+    StopUpload
+
+
+def image_size_message():
+    max_size = settings.TICKET_IMAGE_MAX_SIZE // (1024 * 1024)
+    return f"L'image ne doit pas dépasser {max_size} Mo."
+
+
+class SizeLimitedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams each uploaded file to a temporary file and aborts the upload as
+    soon as it crosses TICKET_IMAGE_MAX_SIZE: the rest of the request body
+    is never read. Installed by the views receiving a ticket image only.
+    """
+
+    too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.TICKET_IMAGE_MAX_SIZE:
+            self.too_large = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def validate_image_size(file):
+    if file.size > settings.TICKET_IMAGE_MAX_SIZE:
+        raise ValidationError(image_size_message(), code="image_too_large")
+
+
+def validate_image_dimensions(file):
+    # only the header of the image is read, its pixels are never decoded
+    width, height = get_image_dimensions(file)
+    if width and height and \
+            width * height > settings.TICKET_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f"L'image ne doit pas dépasser "
+            f"{settings.TICKET_IMAGE_MAX_PIXELS} pixels.",
+            code="image_too_many_pixels",
+        )
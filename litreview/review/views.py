@@ -1,30 +1,57 @@
-from itertools import chain
+import asyncio
+from hashlib import md5
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, Http404
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import View
-from django.core.paginator import Paginator
 from django.core.exceptions import PermissionDenied, \
     ObjectDoesNotExist, FieldError, BadRequest
 from django.contrib import messages
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 
-from .models import Ticket, Review, UserFollows
-from .forms import TicketForm, ReviewForm, FollowForm
+from .models import Ticket, Review, UserFollows, FeedEntry
+from .forms import TicketForm, ReviewForm, FollowForm, FollowImportForm
+from .follows import FOLLOWED, STATUS_LABELS, format_usernames
+from .feed import TICKET, REVIEW, PostStream, InboxStream, PostPaginator, \
+    CursorPaginator
+from .cache import CachedStream, get_feed_version, feed_version_time
+from .search import SearchStream
+from .uploads import SizeLimitedUploadHandler, image_size_message
 
 ERROR_MESSAGE = "Saisie invalide."
 DELETE_MESSAGE = "Suppression effectuée."
 
+# columns read by the ticket and review snippets, the others are deferred
+TICKET_FIELDS = ("title", "description", "image", "image_widths",
+                 "time_created", "time_updated", "review_count",
+                 "user__username")
+REVIEW_FIELDS = ("rating", "headline", "body", "time_created",
+                 "time_updated", "user__username", "ticket__title",
+                 "ticket__image", "ticket__image_widths",
+                 "ticket__time_updated", "ticket__user__username")
+
 
 def permission_denied_view(request, exception):
     return render(request,
                   "review/permission_denied.html",
-                  {"exception": exception})
+                  {"exception": exception},
+                  status=403)
 
 
 def page_not_found_view(request, exception):
     return render(request,
                   "review/page_not_found.html",
-                  {"exception": exception})
+                  {"exception": exception},
+                  status=404)
 
 
 def owner_permission(request, element):
@@ -35,103 +62,268 @@ def owner_permission(request, element):
 
 
 def ticket_already_responded(ticket):
-    if Review.objects.filter(ticket=ticket):
+    if ticket.review_count:
         message = "Vous ne pouvez pas répondre à un ticket" \
                   " qui a déjà obtenu une réponse."
         raise PermissionDenied(message)
 
 
+def ticket_posts():
+    return Ticket.objects.select_related("user").only(*TICKET_FIELDS)
+
+
+def review_posts():
+    # the reviews of a deleted ticket are hidden until they are swept
+    return Review.objects.select_related(
+        "user", "ticket__user"
+    ).filter(ticket__time_deleted__isnull=True).only(*REVIEW_FIELDS)
+
+
 def get_own_posts(user):
-    tickets = Ticket.objects.filter(user=user.id)
-    reviews = Review.objects.filter(user=user.id)
-    own_posts = sorted(
-        chain(tickets, reviews),
-        key=lambda post: post.time_created,
-        reverse=True,
-    )
-    return own_posts
+    tickets = ticket_posts().filter(user=user.id)
+    reviews = review_posts().filter(user=user.id)
+    return tickets, reviews
 
 
-def get_viewable_tickets(user):
-    follows = UserFollows.objects.filter(user=user.id)
-    tickets = Ticket.objects.filter(
+def get_viewable_tickets(user, followed=None):
+    # followed: ids of the users followed by the user, read from the
+    # follow graph cache when not given
+    if followed is None:
+        followed = UserFollows.objects.followed_ids(user.id)
+    tickets = ticket_posts().filter(
         Q(user=user.id) |
-        Q(user__in=follows.values("followed_user"))
+        Q(user__in=followed)
     )
     return tickets
 
 
-def get_viewable_reviews(user):
+def get_viewable_reviews(user, followed=None):
+    if followed is None:
+        followed = UserFollows.objects.followed_ids(user.id)
     own_tickets = Ticket.objects.filter(user=user.id)
-    follows = UserFollows.objects.filter(user=user.id)
-    reviews = Review.objects.filter(
+    reviews = review_posts().filter(
         Q(user=user.id) |
-        Q(user__in=follows.values("followed_user")) |
+        Q(user__in=followed) |
         Q(ticket__in=own_tickets)
     )
     return reviews
 
 
-def get_tickets_responded(posts):
-    tickets_responded = []
-    tickets = []
+def get_feed_stream(user, followed=None):
+    if settings.FEED_INBOX:
+        return InboxStream(FeedEntry.objects.filter(user=user.id),
+                           ticket_posts(),
+                           review_posts())
+    if followed is None:
+        followed = UserFollows.objects.followed_ids(user.id)
+    return PostStream(get_viewable_tickets(user, followed),
+                      get_viewable_reviews(user, followed))
+
+
+async def aget_feed_stream(user):
+    followed = None
+    if not settings.FEED_INBOX:
+        followed = await UserFollows.objects.afollowed_ids(user.id)
+    return get_feed_stream(user, followed)
+
+
+def get_cached_stream(stream, user, name):
+    if settings.FEED_CACHE_TIMEOUT:
+        return CachedStream(stream, user.id, name)
+    return stream
+
+
+def page_etag(request, version):
+    # the page asked, its user and the CSRF secret of its forms, made now
+    # when the page is the first one to need it
+    get_token(request)
+    fingerprint = ":".join((version,
+                            str(request.user.id),
+                            request.get_full_path(),
+                            request.META["CSRF_COOKIE"]))
+    return f'"{md5(fingerprint.encode()).hexdigest()}"'
+
+
+def feed_validators(request):
+    # the feed version changes with every post or follow shown on the
+    # feed and posts pages of the user, no query is needed
+    version = get_feed_version(request.user.id)
+    return page_etag(request, version), feed_version_time(version)
+
+
+def set_validators(response, etag, last_modified=None):
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    # the browsers revalidate the page each time, the shared caches
+    # don't keep it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified_response(request, etag, last_modified=None):
+    # the messages waiting to be shown would be lost with a 304
+    if len(messages.get_messages(request)):
+        return None
+    response = get_conditional_response(request,
+                                        etag=etag,
+                                        last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def get_events_path(request, page_obj):
+    # the events are served by litreview/asgi.py, they are only shown at
+    # the top of the first page
+    if isinstance(request, ASGIRequest) and not page_obj.has_previous():
+        return settings.FEED_EVENTS_PATH
+    return None
+
+
+async def apagination(request, stream, cursor=False):
+    # the page holds the keys of its posts, see PostStream.ahydrate()
+    if cursor:
+        paginator = CursorPaginator(stream)
+        return await paginator.aget_key_page(after=request.GET.get("after"),
+                                             before=request.GET.get("before"))
+    paginator = PostPaginator(stream)
+    page_number = request.GET.get("page")
+    page_obj = await paginator.aget_key_page(page_number)
+    return page_obj
 
-    for post in posts:
-        if type(post) == Ticket:
-            tickets.append(post)
-    for ticket in tickets:
-        all_reviews = Review.objects.filter(ticket=ticket)
-        if all_reviews:
-            tickets_responded.append(ticket.id)
-    return tickets_responded
 
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """
+    LoginRequiredMixin for the views whose handlers are coroutines: the
+    user is loaded from the session with synchronous queries, which can't
+    run in the event loop.
+    """
 
-def pagination(request, posts):
-    paginator = Paginator(posts, 5)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    async def dispatch(self, request, *args, **kwargs):
+        is_authenticated = await sync_to_async(
+            lambda: request.user.is_authenticated
+        )()
+        if not is_authenticated:
+            return self.handle_no_permission()
+        return await View.dispatch(self, request, *args, **kwargs)
 
 
-class Feed(LoginRequiredMixin, View):
+class Feed(AsyncLoginRequiredMixin, View):
     template_name = "review/feed.html"
+    # set to True (e.g. Feed.as_view(cursor_pagination=True)) to paginate
+    # with ?after= / ?before= tokens instead of page numbers
+    cursor_pagination = False
 
-    def get(self, request):
-        tickets = get_viewable_tickets(request.user)
-        reviews = get_viewable_reviews(request.user)
-
-        posts = sorted(
-            chain(tickets, reviews),
-            key=lambda post: post.time_created,
-            reverse=True
-        )
+    async def get(self, request):
+        etag, last_modified = feed_validators(request)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified:
+            return not_modified
 
-        page_obj = pagination(request, posts)
-        tickets_responded = get_tickets_responded(posts)
+        stream = get_cached_stream(await aget_feed_stream(request.user),
+                                   request.user, "feed")
+        page_obj = await apagination(request, stream, self.cursor_pagination)
+        page_obj.object_list = await stream.ahydrate(page_obj.object_list)
 
         context = {"page_obj": page_obj,
-                   "tickets_responded": tickets_responded}
+                   "events_path": get_events_path(request, page_obj)}
+
+        return set_validators(render(request,
+                                     self.template_name,
+                                     context),
+                              etag, last_modified)
+
+
+class PostSnippet(LoginRequiredMixin, View):
+    template_name = "review/partials/feed_post.html"
+
+    def get(self, request, post_type, post_id):
+        if post_type == TICKET:
+            posts = get_viewable_tickets(request.user)
+        elif post_type == REVIEW:
+            posts = get_viewable_reviews(request.user)
+        else:
+            raise Http404
+        post = get_object_or_404(posts, id=post_id)
 
         return render(request,
                       self.template_name,
-                      context)
+                      {"post": post})
 
 
-class PostsPage(LoginRequiredMixin, View):
+class PostsPage(AsyncLoginRequiredMixin, View):
     template_name = "review/posts.html"
+    cursor_pagination = False
 
-    def get(self, request):
-        posts = get_own_posts(request.user)
-        page_obj = pagination(request, posts)
+    async def get(self, request):
+        etag, last_modified = feed_validators(request)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified:
+            return not_modified
+
+        stream = get_cached_stream(PostStream(*get_own_posts(request.user)),
+                                   request.user, "posts")
+        page_obj = await apagination(request, stream, self.cursor_pagination)
+        page_obj.object_list = await stream.ahydrate(page_obj.object_list)
 
         context = {"page_obj": page_obj}
 
+        return set_validators(render(request,
+                                     self.template_name,
+                                     context),
+                              etag, last_modified)
+
+
+class Search(LoginRequiredMixin, View):
+    template_name = "review/search.html"
+
+    def get(self, request):
+        query = request.GET.get("q", "").strip()
+        page_obj = None
+        if query:
+            stream = SearchStream(query,
+                                  get_viewable_tickets(request.user),
+                                  get_viewable_reviews(request.user))
+            page_obj = PostPaginator(stream).get_page(request.GET.get("page"))
+
+        context = {"query": query,
+                   "page_obj": page_obj}
+
         return render(request,
                       self.template_name,
                       context)
 
 
-class CreateTicket(LoginRequiredMixin, View):
+class ImageUploadMixin:
+    """
+    Installs SizeLimitedUploadHandler for the views receiving a ticket
+    image. The handlers can't change once the body is read, and the CSRF
+    middleware reads it before the view, so the CSRF check is made here.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        self.upload_handler = SizeLimitedUploadHandler(request)
+        request.upload_handlers.insert(0, self.upload_handler)
+        return csrf_protect(self.dispatch_upload)(request, *args, **kwargs)
+
+    def dispatch_upload(self, request, *args, **kwargs):
+        if request.method == "POST":
+            # reading FILES parses the body through the handler, the
+            # fields after an aborted upload are missing
+            request.FILES
+            if self.upload_handler.too_large:
+                messages.add_message(request, messages.ERROR,
+                                     image_size_message())
+                return redirect(request.path)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class CreateTicket(LoginRequiredMixin, ImageUploadMixin, View):
     template_name = "review/create_ticket.html"
     form = TicketForm
     model = Ticket
@@ -154,7 +346,7 @@ class CreateTicket(LoginRequiredMixin, View):
         return redirect("create-ticket")
 
 
-class UpdateTicket(LoginRequiredMixin, View):
+class UpdateTicket(LoginRequiredMixin, ImageUploadMixin, View):
     template_name = "review/update_ticket.html"
     form = TicketForm
 
@@ -194,12 +386,13 @@ class DeleteTicket(LoginRequiredMixin, View):
 
     def post(self, request, ticket_id):
         ticket = get_object_or_404(self.model, id=ticket_id)
-        ticket.delete()
+        owner_permission(request, ticket)
+        self.model.objects.mark_deleted(ticket)
         messages.add_message(request, messages.SUCCESS, DELETE_MESSAGE)
         return redirect("posts")
 
 
-class CreateReview(LoginRequiredMixin, View):
+class CreateReview(LoginRequiredMixin, ImageUploadMixin, View):
     template_name = "review/create_review.html"
     review_form = ReviewForm
     ticket_form = TicketForm
@@ -305,28 +498,40 @@ class DeleteReview(LoginRequiredMixin, View):
         return redirect("posts")
 
 
-class FollowPage(LoginRequiredMixin, View):
+class FollowPage(AsyncLoginRequiredMixin, View):
     template_name = "review/follows.html"
     form = FollowForm
     model = UserFollows
 
-    def get(self, request):
+    async def get(self, request):
         form = self.form()
-        follows = self.model.objects.filter(user=request.user)
-        followers = self.model.objects.filter(followed_user=request.user)
+        follows, followers = await asyncio.gather(
+            self.model.objects.afollowed(request.user.id),
+            self.model.objects.afollowers(request.user.id),
+        )
+        # the follows have no time, the page is identified by its content,
+        # read from the follow graph cache
+        etag = page_etag(request, repr((follows, followers)))
+        not_modified = not_modified_response(request, etag)
+        if not_modified:
+            return not_modified
+
         context = {"follows": follows,
                    "form": form,
                    "followers": followers}
-        return render(request,
-                      self.template_name,
-                      context)
+        return set_validators(render(request,
+                                     self.template_name,
+                                     context),
+                              etag)
 
-    def post(self, request):
+    async def post(self, request):
         form = self.form(request.POST)
         message = ERROR_MESSAGE
         message_success = None
         if form.is_valid():
-            follow = self.model.objects.create(request.user, form)
+            follow = await sync_to_async(self.model.objects.create)(
+                request.user, form
+            )
             if follow == FieldError:
                 message = "Vous ne pouvez pas vous suivre vous même."
             elif type(follow) == self.model:
@@ -358,6 +563,56 @@ class DeleteFollow(LoginRequiredMixin, View):
 
     def post(self, request, follow_id):
         follow = get_object_or_404(self.model, id=follow_id)
-        follow.delete()
+        with transaction.atomic():
+            if settings.FEED_INBOX:
+                FeedEntry.objects.prune_follow(follow)
+            follow.delete()
         messages.add_message(request, messages.SUCCESS, DELETE_MESSAGE)
         return redirect("follows")
+
+
+class ImportFollows(LoginRequiredMixin, View):
+    template_name = "review/import_follows.html"
+    form = FollowImportForm
+    model = UserFollows
+
+    def get(self, request):
+        context = {"form": self.form()}
+        return render(request,
+                      self.template_name,
+                      context)
+
+    def post(self, request):
+        form = self.form(request.POST, request.FILES)
+        if not form.is_valid():
+            messages.add_message(request, messages.ERROR, ERROR_MESSAGE)
+            return render(request,
+                          self.template_name,
+                          {"form": form})
+
+        results = self.model.objects.import_follows(
+            request.user,
+            form.cleaned_data["usernames"]
+        )
+        followed = sum(status == FOLLOWED for _, status in results)
+        message = f"{followed} utilisateur(s) ajouté(s) " \
+                  f"à votre liste de suivi."
+        messages.add_message(request, messages.SUCCESS, message)
+        context = {"form": self.form(),
+                   "results": [(username, STATUS_LABELS[status])
+                               for username, status in results]}
+        return render(request,
+                      self.template_name,
+                      context)
+
+
+class ExportFollows(LoginRequiredMixin, View):
+    model = UserFollows
+
+    def get(self, request):
+        usernames = self.model.objects.followed_usernames(request.user)
+        response = HttpResponse(format_usernames(usernames),
+                                content_type="text/plain; charset=utf-8")
+        response["Content-Disposition"] = \
+            'attachment; filename="abonnements.txt"'
+        return response
@@ -0,0 +1,40 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_executor(name, max_workers):
+    return ThreadPoolExecutor(max_workers=max_workers,
+                              thread_name_prefix=name)
+
+
+def run_in_worker(function, *args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception("%s%r failed in a worker.", function.__name__, args)
+    finally:
+        # the worker threads don't go through the request cycle
+        # which closes the connections
+        connections.close_all()
+
+
+def schedule(name, workers, function, *args):
+    """
+    Calls function(*args) once the current transaction is committed, so
+    that it sees the saved rows, in one of the workers threads of the pool
+    called name, or in the current thread when workers is 0.
+    """
+    def submit():
+        if workers:
+            get_executor(name, workers).submit(run_in_worker, function,
+                                               *args)
+        else:
+            function(*args)
+
+    transaction.on_commit(submit)